@@ -0,0 +1,61 @@
+"""Import time benchmark of the command line entry points.
+Fails if an entry point loads a module it does not need at startup, or if its import takes longer than the budget.
+Run from the repository root: python benchmarks/import_time.py [--runs N] [--budget-ms MS]"""
+import argparse
+import os
+import subprocess
+import sys
+
+# Modules every entry point must not import before it is actually used.
+DEFERRED = ["aiohttp", "aiohttp_retry", "sqlite3", "pyparsing", "multiprocessing", "pyarrow", "flatbuffers", "vtdecode.server"]
+
+ENTRY_POINTS = {
+    "vtdecode.main": DEFERRED,
+    "vtdecode.mapbox": DEFERRED,
+    "vtdecode.mapillary": DEFERRED,
+    "vtdecode.xyz": DEFERRED,
+    "vtdecode.encode": DEFERRED + ["geojson"],
+}
+
+def measure(module: str):
+    "Import module in a fresh interpreter. Returns (cumulative microseconds, set of imported modules)."
+    env = dict(os.environ)
+    src = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+    env["PYTHONPATH"] = src + os.pathsep + env.get("PYTHONPATH", "")
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import " + module], env=env, capture_output=True, text=True, check=True)
+    total = None
+    imported = set()
+    for line in result.stderr.splitlines():
+        if(not line.startswith("import time:") or "cumulative" in line):
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        imported.add(name)
+        if(name == module):
+            total = int(cumulative)
+    return (total, imported)
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the import time of the vtdecode entry points.")
+    parser.add_argument("--runs", dest = "runs", help="Number of runs per entry point, the fastest one is reported.", default=5, type=int)
+    parser.add_argument("--budget-ms", dest = "budget_ms", help="Maximum import time of an entry point in milliseconds.", default=200, type=float)
+    args = parser.parse_args()
+
+    failed = False
+    for module, deferred in ENTRY_POINTS.items():
+        runs = [measure(module) for _ in range(args.runs)]
+        best = min(total for total, _ in runs) / 1000
+        loaded = sorted(name for name in deferred if name in runs[0][1])
+        status = "ok"
+        if(loaded):
+            status = "imports " + ", ".join(loaded)
+            failed = True
+        elif(best > args.budget_ms):
+            status = "over budget"
+            failed = True
+        print("{:<20} {:>8.1f} ms  {}".format(module, best, status))
+    if(failed):
+        exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -1,40 +1,193 @@
-from pickletools import bytes_types
-from pyparsing import line
 from .LayerDecoder import LayerDecoder
+from .TileIndex import TileIndex
+from .OverzoomLayer import OverzoomLayer
+from .TileAggregate import TileAggregate
+from .DecodeStats import DecodeStats, stage
+from .MalformedTileError import MalformedTileError
+from .utils import iter_layer_spans
 from . import vector_tile_pb2 as vt_proto
-from geojson import Feature, Point, FeatureCollection, LineString, MultiLineString, MultiPolygon, Polygon, MultiPoint
-from typing import Dict, Tuple, List
-import multiprocessing
+from geojson import FeatureCollection
+from typing import Dict, Tuple, List, Iterator
+from contextlib import contextmanager
+from google.protobuf.message import DecodeError
+import os
+import threading
 from concurrent.futures import ThreadPoolExecutor
 
 class BytesDecoder:
-    def __init__(self, xtile: int, ytile: int, zoom: int, bytes: bytes):
-        "Load the file decoder with a file. Decoding has not started."
+    def __init__(self, xtile: int, ytile: int, zoom: int, bytes: bytes, build_index: bool = False, stats: DecodeStats = None, strict: bool = False):
+        """Load the file decoder with a file. Decoding has not started. With build_index, decode() also builds a spatial index of every layer, available as self.index. Timings and counters are recorded into stats if given.
+        Malformed geometry, tags or layers raise a MalformedTileError in strict mode. Otherwise they are skipped and counted in self.problems, unless not a single layer can be read."""
         self.xtile = xtile
         self.ytile = ytile
         self.zoom = zoom
         self.bytes = bytes
         self.decoded = None
+        self.build_index = build_index
+        self.index = None
+        self.stats = stats
+        self.overzoom_layers = None
+        self.strict = strict
+        self.problems = dict()
+        self.problems_lock = threading.Lock()
+
+    def report_problem(self, problem: str, message: str, layer: str = None) -> None:
+        "Raise a MalformedTileError in strict mode. Otherwise count the problem, also into the statistics as problem_<problem>, and carry on."
+        if(self.strict):
+            raise MalformedTileError(problem, message, layer)
+        with self.problems_lock:
+            self.problems[problem] = self.problems.get(problem, 0) + 1
+        if(self.stats is not None):
+            self.stats.count("problem_" + problem, 1, layer)
+
+    def layer_spans(self, buffer: memoryview) -> List[Tuple[str, int, int]]:
+        "Layers of the tile before any damage. A tile damaged before its first layer cannot be decoded at all, and raises a MalformedTileError in lenient mode too."
+        damage = []
+        spans = iter_layer_spans(buffer, lambda problem, message: damage.append((problem, message)))
+        if(len(damage) > 0):
+            if(len(spans) == 0):
+                raise MalformedTileError("unreadable_tile", "No layer could be read: {}".format(damage[0][1]))
+            self.report_problem(*damage[0])
+        return spans
+
+    def check_readable(self, spans: int, layers: int) -> None:
+        "Raise a MalformedTileError if there were layers, but none of them could be parsed."
+        if(spans > 0 and layers == 0):
+            raise MalformedTileError("unreadable_tile", "None of the {} layers could be parsed.".format(spans))
     
+    @contextmanager
+    def tile_buffer(self):
+        "Zero-copy view of the encoded tile, valid until the with block exits."
+        if(self.bytes is None):
+            raise ValueError("The encoded tile was released by decode(). Call overzoom() before decode(), or use a FileDecoder.")
+        with memoryview(self.bytes) as buffer:
+            yield buffer
+
     def read_protobuf(self) -> vt_proto.Tile:
-        return vt_proto.Tile.FromString(self.bytes)
-    
+        with self.tile_buffer() as buffer:
+            return vt_proto.Tile.FromString(buffer)
+
+    def read_layer(self, buffer: memoryview, start: int, end: int) -> vt_proto.Tile.Layer:
+        "Parse a single layer out of the tile buffer. Returns None for a corrupt layer that was skipped."
+        with buffer[start:end] as layer_buffer:
+            try:
+                with stage(self.stats, "read_protobuf"):
+                    return vt_proto.Tile.Layer.FromString(layer_buffer)
+            except DecodeError as e:
+                self.report_problem("invalid_layer", "Layer could not be parsed: {}".format(e))
+                return None
+
+    def release(self) -> None:
+        "Drop the encoded tile once it is no longer needed, so only the decoded layers stay alive."
+        self.bytes = None
+
     def decode_layer(self, layer: vt_proto.Tile.Layer) -> Tuple[str, FeatureCollection]:
         layer_decoder = LayerDecoder(self, layer)
         layer_name, layer_content = layer_decoder.decode()
+        if(self.index is not None):
+            self.index.add_layer(layer_name, layer_decoder.extent, layer_content, layer_decoder.index)
         return (layer_name, layer_content)
     
     def decode(self):
-        "Perform the decoding of the file. Multiple calls will not re-decode."
+        "Perform the decoding of the file. Multiple calls will not re-decode. The encoded tile is released afterwards."
         if(self.decoded is None):
-            tile = self.read_protobuf()
-            layers = tile.layers
             self.decoded = dict()
+            if(self.build_index):
+                self.index = TileIndex(self.xtile, self.ytile, self.zoom)
 
-            with ThreadPoolExecutor(max_workers=multiprocessing.cpu_count()) as executor:
-                decoded_layers = executor.map(self.decode_layer, layers)
-                executor.shutdown(wait=True)
+            with self.tile_buffer() as buffer:
+                if(self.stats is not None):
+                    self.stats.count("tiles", 1)
+                    self.stats.count("bytes", len(buffer))
+
+                # Every layer is parsed on its own, and its protobuf object is dropped as soon as it is decoded.
+                def decode_span(span):
+                    _, start, end = span
+                    layer = self.read_layer(buffer, start, end)
+                    return self.decode_layer(layer) if layer is not None else None
+
+                spans = self.layer_spans(buffer)
+                with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+                    decoded_layers = [decoded_layer for decoded_layer in executor.map(decode_span, spans) if decoded_layer is not None]
+                    executor.shutdown(wait=True)
+                self.check_readable(len(spans), len(decoded_layers))
                 for layer_name, layer_content in decoded_layers:
                     self.decoded[layer_name] = layer_content
+            self.release()
+
+        return self.decoded
+
+    def iter_layers(self, layer_names: List[str] = None) -> Iterator[Tuple[str, FeatureCollection]]:
+        """Decode and yield one layer at a time without keeping any of them, optionally only the named layers.
+        Peak memory is bounded by the encoded tile plus the largest decoded layer."""
+        with self.tile_buffer() as buffer:
+            if(self.stats is not None):
+                self.stats.count("tiles", 1)
+                self.stats.count("bytes", len(buffer))
+            spans = 0
+            layers = 0
+            for layer_name, start, end in self.layer_spans(buffer):
+                if(layer_names is not None and layer_name not in layer_names):
+                    continue
+                spans += 1
+                layer = self.read_layer(buffer, start, end)
+                if(layer is not None):
+                    layers += 1
+                    yield self.decode_layer(layer)
+            self.check_readable(spans, layers)
+
+    def aggregate(self, group_by: List[str] = None, layer_names: List[str] = None) -> TileAggregate:
+        """Feature counts, point counts, line lengths and polygon areas per layer and group_by property values, optionally only of the named layers.
+        Computed straight from the layers' tables and tile coordinates, no GeoJSON is built. See TileAggregate."""
+        aggregate = TileAggregate(group_by)
+        with self.tile_buffer() as buffer:
+            if(self.stats is not None):
+                self.stats.count("tiles", 1)
+                self.stats.count("bytes", len(buffer))
+            spans = 0
+            layers = 0
+            for layer_name, start, end in self.layer_spans(buffer):
+                if(layer_names is not None and layer_name not in layer_names):
+                    continue
+                spans += 1
+                layer = self.read_layer(buffer, start, end)
+                if(layer is None):
+                    continue
+                layers += 1
+                report = lambda problem, message: self.report_problem(problem, message, layer.name)
+                with stage(self.stats, "aggregate", layer.name):
+                    aggregate.add_layer(layer, self.xtile, self.ytile, self.zoom, report)
+                if(self.stats is not None):
+                    self.stats.count("layers", 1)
+                    self.stats.count("features", len(layer.features), layer.name)
+            self.check_readable(spans, layers)
+        return aggregate
+
+    def overzoom(self, zoom: int, xtile: int, ytile: int, layer_names: List[str] = None, buffer: int = 0) -> Dict[str, FeatureCollection]:
+        """Decode the features of a child tile at a higher zoom level, by clipping and rescaling this tile's geometry in tile coordinates.
+        The parent's layers are parsed once and cached, so deriving every child costs about one decode of the parent.
+        buffer keeps geometry this many tile coordinate units beyond the child's edges."""
+        dz = zoom - self.zoom
+        if(dz < 0 or (xtile >> dz) != self.xtile or (ytile >> dz) != self.ytile):
+            raise ValueError("Tile {}/{}/{} is not a child of tile {}/{}/{}".format(zoom, xtile, ytile, self.zoom, self.xtile, self.ytile))
+
+        if(self.overzoom_layers is None):
+            with self.tile_buffer() as tile_buffer:
+                spans = self.layer_spans(tile_buffer)
+                layers = [self.read_layer(tile_buffer, start, end) for _, start, end in spans]
+                self.check_readable(len(spans), len([layer for layer in layers if layer is not None]))
+                self.overzoom_layers = [
+                    OverzoomLayer(layer, lambda problem, message, name = layer.name: self.report_problem(problem, message, name))
+                    for layer in layers if layer is not None
+                ]
 
-        return self.decoded
\ No newline at end of file
+        child = BytesDecoder(xtile, ytile, zoom, None, stats=self.stats, strict=self.strict)
+        # Problems found while decoding the child are counted with this tile's.
+        child.report_problem = self.report_problem
+        decoded = dict()
+        for overzoom_layer in self.overzoom_layers:
+            if(layer_names is not None and overzoom_layer.layer.name not in layer_names):
+                continue
+            layer_name, layer_content = child.decode_layer(overzoom_layer.clip(dz, xtile - (self.xtile << dz), ytile - (self.ytile << dz), buffer))
+            decoded[layer_name] = layer_content
+        return decoded
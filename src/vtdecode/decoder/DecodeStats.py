@@ -0,0 +1,121 @@
+import json
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Tuple, List
+
+def stage(stats: "DecodeStats", name: str, layer: str = None):
+    "stats.stage(name, layer), or a context manager doing nothing when statistics are not collected."
+    return stats.stage(name, layer) if stats is not None else nullcontext()
+
+class StatsHook:
+    """Receives every measurement recorded by a DecodeStats, e.g. to export them to a metrics system.
+    Layer-level measurements are reported once per decoded layer, never per feature or vertex."""
+    def on_timing(self, stage: str, seconds: float, layer: str = None) -> None:
+        pass
+
+    def on_count(self, counter: str, value: int, layer: str = None) -> None:
+        pass
+
+class DecodeStats:
+    def __init__(self, hooks: List[StatsHook] = None, record: bool = False):
+        """Per-stage timers and counters, in total and per layer. Safe to share between threads and tiles.
+        With record, every measurement is also kept in self.events, to be replayed into a DecodeStats in another process."""
+        self.hooks = list(hooks) if hooks is not None else []
+        self.events = [] if record else None
+        self.lock = threading.Lock()
+        self.timings = dict()
+        self.counters = dict()
+        self.layer_timings = dict()
+        self.layer_counters = dict()
+
+    def add_hook(self, hook: StatsHook) -> None:
+        self.hooks.append(hook)
+
+    def add_time(self, stage: str, seconds: float, layer: str = None, calls: int = 1) -> None:
+        with self.lock:
+            total, count = self.timings.get(stage, (0.0, 0))
+            self.timings[stage] = (total + seconds, count + calls)
+            if(layer is not None):
+                timings = self.layer_timings.setdefault(layer, dict())
+                total, count = timings.get(stage, (0.0, 0))
+                timings[stage] = (total + seconds, count + calls)
+            if(self.events is not None):
+                self.events.append(("time", stage, seconds, layer, calls))
+        for hook in self.hooks:
+            hook.on_timing(stage, seconds, layer)
+
+    def count(self, counter: str, value: int = 1, layer: str = None) -> None:
+        with self.lock:
+            self.counters[counter] = self.counters.get(counter, 0) + value
+            if(layer is not None):
+                counters = self.layer_counters.setdefault(layer, dict())
+                counters[counter] = counters.get(counter, 0) + value
+            if(self.events is not None):
+                self.events.append(("count", counter, value, layer))
+        for hook in self.hooks:
+            hook.on_count(counter, value, layer)
+
+    def replay(self, events: List[Tuple]) -> None:
+        "Add the measurements recorded by a DecodeStats created with record=True."
+        for event in events:
+            if(event[0] == "time"):
+                self.add_time(*event[1:])
+            else:
+                self.count(*event[1:])
+
+    @contextmanager
+    def stage(self, stage: str, layer: str = None):
+        "Time the enclosed block as one call of `stage`."
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - start, layer)
+
+    def summary(self) -> Dict:
+        "All measurements as a JSON serializable dict."
+        def timings_dict(timings):
+            return {stage: {"seconds": total, "calls": count} for stage, (total, count) in timings.items()}
+
+        with self.lock:
+            return {
+                "timings": timings_dict(self.timings),
+                "counters": dict(self.counters),
+                "layers": {
+                    layer: {
+                        "timings": timings_dict(self.layer_timings.get(layer, dict())),
+                        "counters": dict(self.layer_counters.get(layer, dict())),
+                    }
+                    for layer in sorted(set(self.layer_timings) | set(self.layer_counters))
+                },
+            }
+
+    def format_summary(self) -> str:
+        "Human readable summary."
+        summary = self.summary()
+        # Wide enough for problem_<problem> counters.
+        lines = ["{:<28} {:>12} {:>9}".format("Stage", "Seconds", "Calls")]
+        for stage, timing in summary["timings"].items():
+            lines.append("{:<28} {:>12.4f} {:>9}".format(stage, timing["seconds"], timing["calls"]))
+        lines.append("")
+        lines.append("{:<28} {:>12}".format("Counter", "Total"))
+        for counter, value in summary["counters"].items():
+            lines.append("{:<28} {:>12}".format(counter, value))
+        if(len(summary["layers"]) > 0):
+            lines.append("")
+        for layer, layer_summary in summary["layers"].items():
+            lines.append("Layer {}: ".format(layer) + ", ".join(
+                ["{} {}".format(value, counter) for counter, value in layer_summary["counters"].items()] +
+                ["{} {:.4f}s".format(stage, timing["seconds"]) for stage, timing in layer_summary["timings"].items()]
+            ))
+        return "\n".join(lines)
+
+    def report(self, destination: str) -> None:
+        "Print the summary if destination is '-', otherwise write it as JSON to the destination file."
+        if(destination == "-"):
+            print(self.format_summary())
+        else:
+            with open(destination, 'w') as f:
+                json.dump(self.summary(), f, indent=4)
+            print(f"Wrote decoding statistics to {destination}")
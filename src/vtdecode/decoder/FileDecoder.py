@@ -1,40 +1,24 @@
-from pyparsing import line
-from .LayerDecoder import LayerDecoder
-from . import vector_tile_pb2 as vt_proto
-from geojson import Feature, Point, FeatureCollection, LineString, MultiLineString, MultiPolygon, Polygon, MultiPoint
-from typing import Dict, Tuple, List
-import multiprocessing
-from concurrent.futures import ThreadPoolExecutor
+from .BytesDecoder import BytesDecoder
+from .DecodeStats import DecodeStats
+from contextlib import contextmanager
+import mmap
+import os
 
-class FileDecoder:
-    def __init__(self, xtile: int, ytile: int, zoom: int, filename: str):
-        "Load the file decoder with a file. Decoding has not started."
-        self.xtile = xtile
-        self.ytile = ytile
-        self.zoom = zoom
+class FileDecoder(BytesDecoder):
+    def __init__(self, xtile: int, ytile: int, zoom: int, filename: str, build_index: bool = False, stats: DecodeStats = None, strict: bool = False):
+        "Load the file decoder with a file. Decoding has not started. See BytesDecoder for build_index, stats and strict."
+        super().__init__(xtile, ytile, zoom, None, build_index, stats, strict)
         self.filename = filename
-        self.decoded = None
-    
-    def read_protobuf(self) -> vt_proto.Tile:
-        with open(self.filename, 'rb') as f:
-            return vt_proto.Tile.FromString(f.read())
-    
-    def decode_layer(self, layer: vt_proto.Tile.Layer) -> Tuple[str, FeatureCollection]:
-        layer_decoder = LayerDecoder(self, layer)
-        layer_name, layer_content = layer_decoder.decode()
-        return (layer_name, layer_content)
-    
-    def decode(self):
-        "Perform the decoding of the file. Multiple calls will not re-decode."
-        if(self.decoded is None):
-            tile = self.read_protobuf()
-            layers = tile.layers
-            self.decoded = dict()
-
-            with ThreadPoolExecutor(max_workers=multiprocessing.cpu_count()) as executor:
-                decoded_layers = executor.map(self.decode_layer, layers)
-                executor.shutdown(wait=True)
-                for layer_name, layer_content in decoded_layers:
-                    self.decoded[layer_name] = layer_content
 
-        return self.decoded
\ No newline at end of file
+    @contextmanager
+    def tile_buffer(self):
+        "Memory-map the file instead of reading it, so layers are parsed straight from the page cache."
+        with open(self.filename, 'rb') as f:
+            if(os.fstat(f.fileno()).st_size == 0):
+                # Empty files cannot be mapped.
+                with memoryview(b"") as buffer:
+                    yield buffer
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                with memoryview(mapped) as buffer:
+                    yield buffer
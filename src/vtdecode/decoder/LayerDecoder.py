@@ -1,11 +1,13 @@
-from time import sleep
-from pyparsing import line
 from . import vector_tile_pb2 as vt_proto
 from geojson import Feature, Point, FeatureCollection, LineString, MultiLineString, MultiPolygon, Polygon, MultiPoint
 from typing import Dict, Tuple, List
 import math
-from .utils import unzigzag_coords, expand_commands, area_by_shoelace
-import multiprocessing
+from .utils import geometry_parts, tag_pairs, ring_is_exterior, command_bounds, command_counts
+from .SpatialIndex import SpatialIndex
+from .DecodeStats import stage
+import os
+import threading
+import time
 from concurrent.futures import ThreadPoolExecutor
 
 class LayerDecoder:
@@ -14,6 +16,14 @@ class LayerDecoder:
         self.extent = layer.extent
         self.layer = layer
         self.decoded = None
+        self.build_index = filedecoder.build_index
+        self.filedecoder = filedecoder
+        self.index = None
+        self.stats = filedecoder.stats
+        if(self.stats is not None):
+            # Projection time is summed per thread, then attributed to the feature being parsed.
+            self.projection_time = threading.local()
+            self.offset_to_latlon = self.timed_offset_to_latlon
 
         self.xtile = filedecoder.xtile
         self.ytile = filedecoder.ytile
@@ -32,59 +42,51 @@ class LayerDecoder:
         lat_noncoerce = 180 - y_tiled_coord * 360. / (self.extent * 2 ** self.zoom)
         lat = 360. / math.pi * math.atan(math.exp(lat_noncoerce * math.pi / 180)) - 90
         return (lon, lat)
+
+    def timed_offset_to_latlon(self, xoffset, yoffset) -> Tuple[float, float]:
+        start = time.perf_counter()
+        result = LayerDecoder.offset_to_latlon(self, xoffset, yoffset)
+        self.projection_time.total = getattr(self.projection_time, "total", 0.0) + time.perf_counter() - start
+        return result
     
+    @staticmethod
+    def decode_value(value: vt_proto.Tile.Value):
+        "Convert one entry of a layer's values dictionary to a Python value, None if it is empty."
+        if(value.HasField('string_value')):
+            return value.string_value
+        elif(value.HasField('double_value')):
+            return value.double_value
+        elif(value.HasField('float_value')):
+            return value.float_value
+        elif(value.HasField('int_value')):
+            return value.int_value
+        elif(value.HasField('uint_value')):
+            return value.uint_value
+        elif(value.HasField('sint_value')):
+            return value.sint_value
+        elif(value.HasField('bool_value')):
+            return value.bool_value
+        return None
+
+    @staticmethod
+    def decode_values(layer: vt_proto.Tile.Layer) -> List:
+        "Convert the values dictionary of a layer to Python values."
+        return [LayerDecoder.decode_value(value) for value in layer.values]
+
     def extract_properties(self) -> None:
         self.keys = self.layer.keys
-        for value in self.layer.values:
-            if(value.HasField('string_value')):
-                self.values.append(value.string_value)
-            elif(value.HasField('double_value')):
-                self.values.append(value.double_value)
-            elif(value.HasField('float_value')):
-                self.values.append(value.float_value)
-            elif(value.HasField('int_value')):
-                self.values.append(value.int_value)
-            elif(value.HasField('uint_value')):
-                self.values.append(value.uint_value)
-            elif(value.HasField('sint_value')):
-                self.values.append(value.sint_value)
-            elif(value.HasField('bool_value')):
-                self.values.append(value.bool_value)
-    
-    # Parser functions.
-    def parse_point(self, feature: vt_proto.Tile.Feature):
-        geometry_cmds = feature.geometry
-        geom_pc = 0
-
-        acquired_points = []
+        self.values = LayerDecoder.decode_values(self.layer)
 
-        cX = 0
-        cY = 0
-
-        while(geom_pc < len(geometry_cmds)):
-            command_integer = geometry_cmds[geom_pc]
-            command_id = command_integer & 0x07
-            command_count = command_integer >> 3
-            
-            if(command_id == 1):
-                for i in range(command_count):
-                    geom_pc += 1
-                    dX = unzigzag_coords(geometry_cmds[geom_pc])
-                    geom_pc += 1
-                    dY = unzigzag_coords(geometry_cmds[geom_pc])
-                    x = cX + dX
-                    y = cY + dY
-                    acquired_points.append(self.offset_to_latlon(x, y))
-                    cX = x
-                    cY = y
-            else:
-                print("ERROR: Unexpected command encountered in Point feature. Ignored.")
-            geom_pc += 1
-        
-        tags = feature.tags
-        tag_pairs = [(tags[i*2], tags[i*2+1]) for i in range(len(tags)//2)]
-        properties = {self.keys[key]: self.values[value] for key, value in tag_pairs}
+    def report(self, problem: str, message: str) -> None:
+        "Raise a MalformedTileError in strict mode, otherwise count the problem and carry on."
+        self.filedecoder.report_problem(problem, message, self.layer.name)
 
+    def parse_properties(self, feature: vt_proto.Tile.Feature) -> Dict:
+        return {self.keys[key]: self.values[value] for key, value in tag_pairs(feature.tags, len(self.keys), len(self.values), self.report)}
+    
+    # Parser functions, building GeoJSON from the parts validated by geometry_parts.
+    def parse_point(self, parts: List[List[Tuple[int, int]]], properties: Dict):
+        acquired_points = [self.offset_to_latlon(x, y) for part in parts for x, y in part]
         if(len(acquired_points) == 1):
             return Point(
                 coordinates = acquired_points[0],
@@ -96,41 +98,8 @@ class LayerDecoder:
                 properties=properties
             )
     
-    def parse_linestring(self, feature: vt_proto.Tile.Feature):
-        geometry_cmds = feature.geometry
-        acquired_lines = []
-
-        cX = 0
-        cY = 0
-
-        all_commands = expand_commands(geometry_cmds)
-        split_commands = []
-        for command in all_commands:
-            if(command[0] == 1):
-                split_commands.append([command])
-            elif(command[0] == 2):
-                split_commands[-1].extend([command])
-        
-        for lines in split_commands:
-            line_coords = []
-            for command_id, x, y in lines:
-                if(command_id == 1 or command_id == 2):
-                    dX = unzigzag_coords(x)
-                    dY = unzigzag_coords(y)
-                    x = cX + dX
-                    y = cY + dY
-                    line_coords.append(self.offset_to_latlon(x, y))
-                    cX = x
-                    cY = y
-                else:
-                    print("ERROR: ClosePath command found in LineString feature. This is likely an error, closing the linestring feature as a best-effort guess.")
-                    line_coords.append(line_coords[0])
-            acquired_lines.append(line_coords)
-        
-        tags = feature.tags
-        tag_pairs = [(tags[i*2], tags[i*2+1]) for i in range(len(tags)//2)]
-        properties = {self.keys[key]: self.values[value] for key, value in tag_pairs}
-
+    def parse_linestring(self, parts: List[List[Tuple[int, int]]], properties: Dict):
+        acquired_lines = [[self.offset_to_latlon(x, y) for x, y in line] for line in parts]
         if(len(acquired_lines) > 1):
             return MultiLineString(
                 coordinates=acquired_lines,
@@ -142,74 +111,16 @@ class LayerDecoder:
                 properties=properties
             )
 
-    def parse_polygon(self, feature: vt_proto.Tile.Feature):
-        geometry_cmds = feature.geometry
-
-        acquired_polygons = []
-
-        tags = feature.tags
-        tag_pairs = [(tags[i*2], tags[i*2+1]) for i in range(len(tags)//2)]
-        properties = {self.keys[key]: self.values[value] for key, value in tag_pairs}
-
-        cX = 0
-        cY = 0
-
-        all_commands = expand_commands(geometry_cmds)
-
-        split_commands = []
-        for command in all_commands:
-            if(command[0] == 1):
-                split_commands.append([command])
-            elif(command[0] == 2 or command[0] == 7):
-                split_commands[-1].extend([command])
-        
-        # Sanity check: All polygons should have a start command MoveTo and an end command ClosePath.
-        for command in split_commands:
-            if(command[0][0] != 1):
-                print("WARN: Polygon command does not start with MoveTo. There might be unknown consequences.")
-            if(command[-1][0] != 7):
-                print("WARN: Polygon command does not end with ClosePath. There might be unknown consequences.")
-        
-        for polygons in split_commands:
-            poly_coords = []
-            poly_raw_coords = []
-            for command_id, x, y in polygons:
-                if(command_id == 1 or command_id == 2):
-                    dX = unzigzag_coords(x)
-                    dY = unzigzag_coords(y)
-                    x = cX + dX
-                    y = cY + dY
-                    poly_coords.append(self.offset_to_latlon(x, y))
-                    poly_raw_coords.append((x, y))
-                    cX = x
-                    cY = y
-                else:
-                    poly_coords.append(poly_coords[0])
-                    poly_raw_coords.append(poly_raw_coords[0])
-            
-            area = 0
-            if(poly_raw_coords[0] == poly_raw_coords[-1]):
-                area = area_by_shoelace(poly_raw_coords[:-1])
-            else:
-                area = area_by_shoelace(poly_raw_coords)
-            
-            if (area >= 0):
-                acquired_polygons.append((1, poly_coords))
-            else:
-                acquired_polygons.append((-1, poly_coords))
-
-        # Divide into sequences of exterior and interior rings
+    def parse_polygon(self, parts: List[List[Tuple[int, int]]], properties: Dict):
+        # Divide into sequences of exterior and interior rings. geometry_parts guarantees the first ring is exterior.
         polygon_items = []
-        for polygon in acquired_polygons:
-            if(polygon[0] > 0):
-                # Exterior ring
-                polygon_items.append([polygon[1]])
+        for ring in parts:
+            poly_coords = [self.offset_to_latlon(x, y) for x, y in ring]
+            poly_coords.append(poly_coords[0])
+            if(ring_is_exterior(ring)):
+                polygon_items.append([poly_coords])
             else:
-                # Interior ring
-                if(len(polygon_items) >= 1):
-                    polygon_items[-1].extend([polygon[1]])
-                else:
-                    print("ERROR: Interior ring found before exterior ring. The interior ring will be ignored.")
+                polygon_items[-1].append(poly_coords)
         
         if(len(polygon_items) > 1):
             return MultiPolygon(
@@ -223,28 +134,79 @@ class LayerDecoder:
             )
     
     def parse_feature(self, feature: vt_proto.Tile.Feature) -> Feature:
-        geom_type = feature.type
-        if(geom_type == vt_proto.Tile.GeomType.POINT):
-            return Feature(geometry=self.parse_point(feature))
-        elif(geom_type == vt_proto.Tile.GeomType.LINESTRING):
-            return Feature(geometry=self.parse_linestring(feature))
-        elif(geom_type == vt_proto.Tile.GeomType.POLYGON):
-            return Feature(geometry=self.parse_polygon(feature))
+        "Decode one feature. Returns None for a malformed feature that was skipped, see geometry_parts."
+        parts = geometry_parts(feature.geometry, feature.type, self.report)
+        if(parts is None):
+            return None
+        properties = self.parse_properties(feature)
+        if(feature.type == vt_proto.Tile.GeomType.POINT):
+            geometry = self.parse_point(parts, properties)
+        elif(feature.type == vt_proto.Tile.GeomType.LINESTRING):
+            geometry = self.parse_linestring(parts, properties)
+        else:
+            geometry = self.parse_polygon(parts, properties)
+        return Feature(geometry=geometry)
+
+    def parse_instrumented_feature(self, feature: vt_proto.Tile.Feature) -> Tuple[Feature, Tuple[int, int, int, int], float, float]:
+        "Parse a feature, computing its bounding box in tile coordinates and the time spent parsing and projecting it when requested."
+        if(self.stats is None):
+            parsed = self.parse_feature(feature)
+            elapsed = projection = 0.0
+        else:
+            projection_before = getattr(self.projection_time, "total", 0.0)
+            start = time.perf_counter()
+            parsed = self.parse_feature(feature)
+            elapsed = time.perf_counter() - start
+            projection = getattr(self.projection_time, "total", 0.0) - projection_before
+
+        # Bounds are computed after parsing, so only features that passed validation are scanned.
+        bounds = command_bounds(feature.geometry) if self.build_index and parsed is not None else None
+        return parsed, bounds, elapsed, projection
+
+    def record_stats(self, parse_results) -> None:
+        "Report per-layer counters and the summed geometry and projection times."
+        layer_name = self.layer.name
+        vertices = 0
+        rings = 0
+        for feature in self.layer.features:
+            feature_vertices, feature_parts = command_counts(feature.geometry)
+            vertices += feature_vertices
+            if(feature.type == vt_proto.Tile.GeomType.POLYGON):
+                rings += feature_parts
+        projection = sum(result[3] for result in parse_results)
+        geometry = sum(result[2] for result in parse_results) - projection
+        self.stats.add_time("geometry", geometry, layer_name, len(parse_results))
+        self.stats.add_time("projection", projection, layer_name, vertices)
+        self.stats.count("layers", 1)
+        self.stats.count("layer_bytes", self.layer.ByteSize(), layer_name)
+        self.stats.count("features", len(self.layer.features), layer_name)
+        self.stats.count("vertices", vertices, layer_name)
+        self.stats.count("rings", rings, layer_name)
 
     def decode(self) -> Tuple[str, FeatureCollection]:
         if(self.decoded is None):
-            self.extract_properties()
+            with stage(self.stats, "extract_properties", self.layer.name):
+                self.extract_properties()
 
             layer_content = []
 
-            num_cpus = multiprocessing.cpu_count()
+            num_cpus = os.cpu_count()
             if(num_cpus == None):
                 num_cpus = 4
 
             features_list = list(self.layer.features)
 
             with ThreadPoolExecutor(max_workers=num_cpus) as executor:
-                layer_content = list(executor.map(self.parse_feature, features_list))
+                if(self.build_index or self.stats is not None):
+                    parse_results = list(executor.map(self.parse_instrumented_feature, features_list))
+                    if(self.stats is not None):
+                        self.record_stats(parse_results)
+                    parse_results = [result for result in parse_results if result[0] is not None]
+                    layer_content = [result[0] for result in parse_results]
+                    if(self.build_index):
+                        self.index = SpatialIndex([result[1] for result in parse_results])
+                else:
+                    layer_content = [parsed for parsed in executor.map(self.parse_feature, features_list) if parsed is not None]
                 executor.shutdown(wait=True)
             
             self.decoded = self.layer.name, FeatureCollection(layer_content)
@@ -0,0 +1,13 @@
+class MalformedTileError(ValueError):
+    def __init__(self, problem: str, message: str, layer: str = None):
+        """A tile that does not follow the vector tile specification, raised by decoders in strict mode.
+        problem is a short identifier such as missing_moveto, the same names lenient decoders count problems under."""
+        super().__init__(problem, message, layer)
+        self.problem = problem
+        self.message = message
+        self.layer = layer
+
+    def __str__(self) -> str:
+        if(self.layer is None):
+            return "{}: {}".format(self.problem, self.message)
+        return "{} in layer {}: {}".format(self.problem, self.layer, self.message)
@@ -0,0 +1,94 @@
+from . import vector_tile_pb2 as vt_proto
+from .utils import geometry_parts, tag_pairs, ring_is_exterior, clip_line, clip_ring
+from .SpatialIndex import SpatialIndex
+from ..encoder.utils import encode_points, encode_lines, prepare_ring, remove_repeated_points
+from typing import Tuple, List
+
+class OverzoomLayer:
+    def __init__(self, layer: vt_proto.Tile.Layer, report = None):
+        """Integer geometry of a parent tile's layer, prepared once and then clipped for any number of child tiles.
+        Children keep the parent's extent, so coordinates are scaled up by 2 ** (child zoom - parent zoom) without losing precision.
+        Geometry and tags are validated once, by geometry_parts and tag_pairs like LayerDecoder does, so the children keep the features a decode of the parent keeps.
+        Problems are passed to report(problem, message) if given."""
+        self.layer = layer
+        self.extent = layer.extent
+        self.parts = []
+        self.tags = []
+        for feature in layer.features:
+            # None for a feature decode() skips, see geometry_parts.
+            parts = geometry_parts(feature.geometry, feature.type, report)
+            self.parts.append(parts)
+            self.tags.append([tag for pair in tag_pairs(feature.tags, len(layer.keys), len(layer.values), report) for tag in pair] if parts is not None else None)
+        bounds = []
+        for parts in self.parts:
+            points = [point for part in parts for point in part] if parts is not None else []
+            if(len(points) == 0):
+                bounds.append((0, 0, -1, -1))
+            else:
+                xs, ys = zip(*points)
+                bounds.append((min(xs), min(ys), max(xs), max(ys)))
+        self.index = SpatialIndex(bounds)
+
+    def clip_polygon(self, rings: List[List[Tuple[int, int]]], min_v: int, max_v: int) -> List[List[List[Tuple[int, int]]]]:
+        "Clip the rings of a polygon feature, dropping interior rings whose exterior ring disappeared."
+        polygons = []
+        exterior_kept = False
+        for ring in rings:
+            exterior = ring_is_exterior(ring)
+            clipped = clip_ring(ring, min_v, max_v)
+            clipped = prepare_ring(clipped, exterior) if len(clipped) >= 3 else None
+            if(exterior):
+                exterior_kept = clipped is not None
+                if(exterior_kept):
+                    polygons.append([clipped])
+            elif(exterior_kept and clipped is not None):
+                polygons[-1].append(clipped)
+        return polygons
+
+    def clip_geometry(self, geom_type: int, parts: List[List[Tuple[int, int]]], min_v: int, max_v: int) -> List[int]:
+        "Clipped geometry commands of a feature with parts validated by geometry_parts, or None if nothing is left inside the square [min_v, max_v]."
+        if(geom_type == vt_proto.Tile.GeomType.POINT):
+            points = [point for part in parts for point in part if min_v <= point[0] <= max_v and min_v <= point[1] <= max_v]
+            return encode_points(points) if len(points) > 0 else None
+        elif(geom_type == vt_proto.Tile.GeomType.LINESTRING):
+            lines = [remove_repeated_points(clipped) for line in parts for clipped in clip_line(line, min_v, max_v)]
+            lines = [line for line in lines if len(line) >= 2]
+            return encode_lines(lines, False) if len(lines) > 0 else None
+        elif(geom_type == vt_proto.Tile.GeomType.POLYGON):
+            rings = [ring for polygon in self.clip_polygon(parts, min_v, max_v) for ring in polygon]
+            return encode_lines(rings, True) if len(rings) > 0 else None
+        return None
+
+    def clip(self, dz: int, dx: int, dy: int, buffer: int = 0) -> vt_proto.Tile.Layer:
+        """Child layer covering tile (dx, dy) of the 2 ** dz by 2 ** dz grid inside the parent tile.
+        buffer extends the clipping square beyond the child's edges, in child tile coordinates."""
+        scale = 1 << dz
+        offset_x = dx * self.extent
+        offset_y = dy * self.extent
+        min_v = -buffer
+        max_v = self.extent + buffer
+
+        child = vt_proto.Tile.Layer()
+        child.name = self.layer.name
+        child.version = self.layer.version
+        child.extent = self.extent
+        # Tags keep pointing into the parent's dictionaries.
+        child.keys.extend(self.layer.keys)
+        child.values.extend(self.layer.values)
+
+        for i in self.index.query_bbox((offset_x + min_v) / scale, (offset_y + min_v) / scale, (offset_x + max_v) / scale, (offset_y + max_v) / scale):
+            if(self.parts[i] is None):
+                continue
+            feature = self.layer.features[i]
+            parts = [[(x * scale - offset_x, y * scale - offset_y) for x, y in part] for part in self.parts[i]]
+            geometry = self.clip_geometry(feature.type, parts, min_v, max_v)
+            if(geometry is None):
+                continue
+            clipped = child.features.add()
+            if(feature.HasField("id")):
+                clipped.id = feature.id
+            clipped.type = feature.type
+            # Only valid tags are copied, their problems were reported once for the parent.
+            clipped.tags.extend(self.tags[i])
+            clipped.geometry.extend(geometry)
+        return child
@@ -0,0 +1,71 @@
+import math
+from typing import Tuple, List
+
+class SpatialIndex:
+    def __init__(self, bounds: List[Tuple[float, float, float, float]], node_size: int = 16):
+        "Build a static R-tree over bounding boxes using Sort-Tile-Recursive packing. Items are referred to by their position in `bounds`."
+        self.node_size = max(node_size, 2)
+        self.bounds = list(bounds)
+        # levels[0] are the leaves. Every node is (min_x, min_y, max_x, max_y, first_child, child_count).
+        self.levels = []
+
+        entries = [(b[0], b[1], b[2], b[3], i, 1) for i, b in enumerate(self.bounds)]
+        if(len(entries) > 0):
+            entries = self._pack(entries)
+            self.levels.append(entries)
+            while(len(entries) > 1):
+                entries = self._parents(entries)
+                self.levels.append(entries)
+
+    def _pack(self, entries: List[Tuple]) -> List[Tuple]:
+        "Order entries so that consecutive runs of node_size are spatially close."
+        num_nodes = int(math.ceil(len(entries) / self.node_size))
+        num_slices = int(math.ceil(math.sqrt(num_nodes)))
+        slice_size = num_slices * self.node_size
+
+        entries = sorted(entries, key=lambda e: e[0] + e[2])
+        packed = []
+        for start in range(0, len(entries), slice_size):
+            packed.extend(sorted(entries[start:start + slice_size], key=lambda e: e[1] + e[3]))
+        return packed
+
+    def _parents(self, children: List[Tuple]) -> List[Tuple]:
+        parents = []
+        for start in range(0, len(children), self.node_size):
+            group = children[start:start + self.node_size]
+            parents.append((
+                min(c[0] for c in group),
+                min(c[1] for c in group),
+                max(c[2] for c in group),
+                max(c[3] for c in group),
+                start,
+                len(group),
+            ))
+        return self._pack(parents) if len(parents) > self.node_size else parents
+
+    def query_bbox(self, min_x: float, min_y: float, max_x: float, max_y: float) -> List[int]:
+        "Positions of all items whose bounding box intersects the given box."
+        if(len(self.levels) == 0):
+            return []
+
+        result = []
+        top = len(self.levels) - 1
+        stack = [(top, i) for i in range(len(self.levels[top]))]
+        while(len(stack) > 0):
+            level, i = stack.pop()
+            node = self.levels[level][i]
+            if(node[0] > max_x or node[2] < min_x or node[1] > max_y or node[3] < min_y):
+                continue
+            if(level == 0):
+                result.append(node[4])
+            else:
+                stack.extend((level - 1, child) for child in range(node[4], node[4] + node[5]))
+        result.sort()
+        return result
+
+    def query_point(self, x: float, y: float, tolerance: float = 0) -> List[int]:
+        "Positions of all items whose bounding box contains the point, grown by `tolerance` on every side."
+        return self.query_bbox(x - tolerance, y - tolerance, x + tolerance, y + tolerance)
+
+    def __len__(self) -> int:
+        return len(self.bounds)
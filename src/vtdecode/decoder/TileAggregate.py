@@ -0,0 +1,119 @@
+import math
+import threading
+from . import vector_tile_pb2 as vt_proto
+from .LayerDecoder import LayerDecoder
+from .utils import geometry_parts, tag_pairs, area_by_shoelace
+from typing import Dict, Tuple, List
+
+# WGS 84 semi-major axis, the sphere radius of Web Mercator.
+EARTH_RADIUS = 6378137.0
+
+def metrics_dict(totals: List) -> Dict:
+    features, points, length, area = totals
+    return {"features": features, "points": points, "length": round(length, 3), "area": round(area, 3)}
+
+class TileAggregate:
+    def __init__(self, group_by: List[str] = None):
+        """Number of features, number of points, line length in meters and polygon area in square meters, per layer and
+        per combination of values of the group_by properties. Computed from a layer's keys and values tables and its integer
+        tile coordinates, without projecting vertices or building GeoJSON. Aggregates of several tiles are added up with merge()."""
+        self.group_by = list(group_by) if group_by is not None else []
+        # layer name -> {tuple of group_by values -> [features, points, length, area]}
+        self.layers = dict()
+
+    def feature_group(self, pairs: List[Tuple[int, int]], group_keys: List[int], layer: vt_proto.Tile.Layer, values: Dict) -> Tuple:
+        "Values of the group_by properties of a feature with the given tag_pairs, None where it has none. Only the values used are decoded, once per layer."
+        group = [None] * len(group_keys)
+        for key_index, value_index in pairs:
+            if(key_index in group_keys):
+                if(value_index not in values):
+                    values[value_index] = LayerDecoder.decode_value(layer.values[value_index])
+                group[group_keys.index(key_index)] = values[value_index]
+        return tuple(group)
+
+    def add_layer(self, layer: vt_proto.Tile.Layer, xtile: int, ytile: int, zoom: int, report = None) -> None:
+        """Aggregate the features of a layer of tile (xtile, ytile, zoom). Lengths and areas are measured in tile coordinates and scaled
+        by the Mercator scale factor at the latitude of each segment or ring. Geometry and tags are validated by geometry_parts and tag_pairs
+        like LayerDecoder does, so the same features are counted, and their problems are passed to report(problem, message) if given."""
+        n = layer.extent * 2 ** zoom
+        # Meters per tile coordinate unit at the equator, and Mercator y of the tile's top edge in tile units.
+        unit = 2 * math.pi * EARTH_RADIUS / n
+        top = ytile * layer.extent
+
+        def scale(y: float) -> float:
+            "Meters per tile coordinate unit at tile coordinate y, the equator's scaled by cos(latitude)."
+            return unit / math.cosh(math.pi * (1 - 2 * (top + y) / n))
+
+        key_index = {key: i for i, key in enumerate(layer.keys)}
+        group_keys = [key_index.get(name, -1) for name in self.group_by]
+        values = dict()
+        groups = self.layers.setdefault(layer.name, dict())
+        for feature in layer.features:
+            parts = geometry_parts(feature.geometry, feature.type, report)
+            if(parts is None):
+                continue
+            pairs = tag_pairs(feature.tags, len(layer.keys), len(layer.values), report)
+
+            group = self.feature_group(pairs, group_keys, layer, values) if len(group_keys) > 0 else ()
+            totals = groups.get(group)
+            if(totals is None):
+                totals = groups[group] = [0, 0, 0.0, 0.0]
+            totals[0] += 1
+            if(feature.type == vt_proto.Tile.GeomType.POINT):
+                totals[1] += sum(len(part) for part in parts)
+            elif(feature.type == vt_proto.Tile.GeomType.LINESTRING):
+                for part in parts:
+                    for (x0, y0), (x1, y1) in zip(part, part[1:]):
+                        totals[2] += math.hypot(x1 - x0, y1 - y0) * scale((y0 + y1) / 2)
+            elif(feature.type == vt_proto.Tile.GeomType.POLYGON):
+                # Interior rings wind the other way, so their negative areas subtract the holes.
+                for ring in parts:
+                    if(len(ring) >= 3):
+                        totals[3] += area_by_shoelace(ring) * scale(sum(y for _, y in ring) / len(ring)) ** 2
+
+    def merge(self, other: "TileAggregate") -> None:
+        "Add the totals of another aggregate with the same group_by properties."
+        for layer_name, other_groups in other.layers.items():
+            groups = self.layers.setdefault(layer_name, dict())
+            for group, other_totals in other_groups.items():
+                totals = groups.get(group)
+                if(totals is None):
+                    groups[group] = list(other_totals)
+                else:
+                    for i, value in enumerate(other_totals):
+                        totals[i] += value
+
+    def summary(self) -> Dict:
+        "JSON serializable totals per layer, and with group_by one entry per group of property values, largest groups first."
+        result = dict()
+        for layer_name, groups in self.layers.items():
+            layer_summary = metrics_dict([sum(totals[i] for totals in groups.values()) for i in range(4)])
+            if(len(self.group_by) > 0):
+                layer_summary["groups"] = [
+                    dict(properties=dict(zip(self.group_by, group)), **metrics_dict(totals))
+                    for group, totals in sorted(groups.items(), key=lambda item: -item[1][0])
+                ]
+            result[layer_name] = layer_summary
+        return result
+
+class RangeAggregate:
+    def __init__(self, group_by: List[str] = None):
+        "Summaries of every tile of a range and their total. Safe to share between threads."
+        self.group_by = list(group_by) if group_by is not None else []
+        self.tiles = []
+        self.total = TileAggregate(self.group_by)
+        self.lock = threading.Lock()
+
+    def add(self, tile: Tuple[int, int, int], aggregate: TileAggregate) -> None:
+        tile_summary = aggregate.summary()
+        with self.lock:
+            self.tiles.append((tile, tile_summary))
+            self.total.merge(aggregate)
+
+    def summary(self) -> Dict:
+        with self.lock:
+            return {
+                "group_by": self.group_by,
+                "tiles": [{"tile": "{}/{}/{}".format(*tile), "layers": layers} for tile, layers in sorted(self.tiles)],
+                "total": self.total.summary(),
+            }
@@ -0,0 +1,49 @@
+from .SpatialIndex import SpatialIndex
+from .utils import latlon_to_offset
+from geojson import Feature, FeatureCollection
+from typing import Dict, Tuple, List
+
+class TileIndex:
+    def __init__(self, xtile: int, ytile: int, zoom: int):
+        "Spatial indexes of the layers of one decoded tile. Queries take lon/lat and are answered in tile coordinates."
+        self.xtile = xtile
+        self.ytile = ytile
+        self.zoom = zoom
+        self.layers = dict()
+
+    def add_layer(self, layer_name: str, extent: int, layer_content: FeatureCollection, index: SpatialIndex) -> None:
+        self.layers[layer_name] = (extent, layer_content, index)
+
+    def _select(self, layers) -> List[str]:
+        if(layers is None):
+            return list(self.layers.keys())
+        if(isinstance(layers, str)):
+            layers = [layers]
+        return [layer for layer in layers if layer in self.layers]
+
+    def query_bbox(self, min_lon: float, min_lat: float, max_lon: float, max_lat: float, layers=None) -> Dict[str, List[Feature]]:
+        "Features whose bounding box intersects the lon/lat box, grouped by layer name."
+        result = dict()
+        for layer_name in self._select(layers):
+            extent, layer_content, index = self.layers[layer_name]
+            # Tile y grows southwards, so the northern edge gives the smaller y.
+            min_x, min_y = latlon_to_offset(self.xtile, self.ytile, self.zoom, min_lon, max_lat, extent)
+            max_x, max_y = latlon_to_offset(self.xtile, self.ytile, self.zoom, max_lon, min_lat, extent)
+            features = layer_content["features"]
+            matches = [features[i] for i in index.query_bbox(min_x, min_y, max_x, max_y)]
+            if(len(matches) > 0):
+                result[layer_name] = matches
+        return result
+
+    def query_point(self, lon: float, lat: float, tolerance: float = 1, layers=None) -> Dict[str, List[Feature]]:
+        """Features whose bounding box contains the point, grouped by layer name. `tolerance` is in tile coordinate units.
+        Point features have empty boxes and decoded positions are rounded, so a tolerance below about one unit misses them."""
+        result = dict()
+        for layer_name in self._select(layers):
+            extent, layer_content, index = self.layers[layer_name]
+            x, y = latlon_to_offset(self.xtile, self.ytile, self.zoom, lon, lat, extent)
+            features = layer_content["features"]
+            matches = [features[i] for i in index.query_point(x, y, tolerance)]
+            if(len(matches) > 0):
+                result[layer_name] = matches
+        return result
@@ -1,4 +1,3 @@
-from pyparsing import line
 from . import vector_tile_pb2 as vt_proto
 from geojson import Feature, Point, FeatureCollection, LineString, MultiLineString, MultiPolygon, Polygon, MultiPoint
 from typing import Dict, Tuple, List
@@ -14,10 +14,36 @@ def num2deg(xtile: int, ytile: int, zoom: int) -> Tuple[float, float]:
   lat_deg = math.degrees(lat_rad)
   return (lat_deg, lon_deg)
 
+MAX_LATITUDE = 85.0511287798066
+
+def deg2frac(lat_deg: float, lon_deg: float, zoom: int) -> Tuple[float, float]:
+  "Fractional tile coordinates of a position, the inverse of num2deg."
+  n = 2.0 ** zoom
+  lat_rad = math.radians(max(min(lat_deg, MAX_LATITUDE), -MAX_LATITUDE))
+  xtile = (lon_deg + 180.0) / 360.0 * n
+  ytile = (1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n
+  return (xtile, ytile)
+
+def deg2num(lat_deg: float, lon_deg: float, zoom: int) -> Tuple[int, int]:
+  "Tile containing a position, clamped to the tiles that exist at the zoom level."
+  xtile, ytile = deg2frac(lat_deg, lon_deg, zoom)
+  n = 2 ** zoom
+  return (min(max(int(math.floor(xtile)), 0), n - 1), min(max(int(math.floor(ytile)), 0), n - 1))
+
+def latlon_to_offset(xtile: int, ytile: int, zoom: int, lon: float, lat: float, extent: int) -> Tuple[float, float]:
+    "Inverse of LayerDecoder.offset_to_latlon, giving the position in tile coordinates. Latitudes beyond the Web Mercator limit are clamped to it, like deg2frac does."
+    n = extent * 2 ** zoom
+    lat = max(min(lat, MAX_LATITUDE), -MAX_LATITUDE)
+    x_tiled_coord = (lon + 180) * n / 360.
+    y_tiled_coord = (180 - 180. / math.pi * math.log(math.tan(math.pi / 4 + math.radians(lat) / 2))) * n / 360.
+    return (x_tiled_coord - xtile * extent, y_tiled_coord - ytile * extent)
+
 def unzigzag_coords(value: int) -> int:
     return (value >> 1) ^ (-(value & 1))
 
-def expand_commands(cmds: List[int]) -> List[Tuple]:
+def expand_commands(cmds: List[int], report = None) -> List[Tuple]:
+    """Split a geometry command stream into (command id, parameter, parameter) tuples.
+    An unknown command ends the expansion, since its parameter count is unknown. It is passed to report(problem, message) if given."""
     expanded_cmds = []
     cmds_pc = 0
     while(cmds_pc < len(cmds)):
@@ -34,6 +60,298 @@ def expand_commands(cmds: List[int]) -> List[Tuple]:
         elif(command_id == 7):
             expanded_cmds.extend([(command_id, -1, -1)]*command_count)
         else:
-            print("ERROR: Unknown command encountered.")
+            if(report is not None):
+                report("unknown_command", "Unknown geometry command {}.".format(command_id))
+            break
         cmds_pc += 1
-    return expanded_cmds
\ No newline at end of file
+    return expanded_cmds
+
+def read_varint(buffer, pos: int) -> Tuple[int, int]:
+    "Read a protobuf varint starting at pos. Returns the value and the position after it."
+    result = 0
+    shift = 0
+    while(True):
+        byte = buffer[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if(byte < 0x80):
+            return result, pos
+        shift += 7
+
+def skip_field(buffer, pos: int, wire_type: int) -> int:
+    "Position after the value of a protobuf field with the given wire type."
+    if(wire_type == 0):
+        return read_varint(buffer, pos)[1]
+    elif(wire_type == 1):
+        return pos + 8
+    elif(wire_type == 2):
+        length, pos = read_varint(buffer, pos)
+        return pos + length
+    elif(wire_type == 5):
+        return pos + 4
+    raise ValueError("Unsupported protobuf wire type {}".format(wire_type))
+
+def layer_name_at(buffer, start: int, end: int) -> str:
+    "Name of the encoded Tile.Layer message at buffer[start:end], read without parsing the layer."
+    pos = start
+    while(pos < end):
+        key, pos = read_varint(buffer, pos)
+        if(key == (1 << 3 | 2)):
+            length, pos = read_varint(buffer, pos)
+            return bytes(buffer[pos:pos + length]).decode("utf-8")
+        pos = skip_field(buffer, pos, key & 0x07)
+    return None
+
+def iter_layer_spans(buffer, report = None) -> List[Tuple[str, int, int]]:
+    """Name, start and end of every encoded layer in a Tile message, found by scanning the wire format only.
+    If report is given, a truncated or corrupt tile is passed to report(problem, message) and the layers found before the damage are returned."""
+    spans = []
+    pos = 0
+    end = len(buffer)
+    try:
+        while(pos < end):
+            key, pos = read_varint(buffer, pos)
+            wire_type = key & 0x07
+            if(key >> 3 == 3 and wire_type == 2):
+                length, pos = read_varint(buffer, pos)
+                if(pos + length > end):
+                    raise IndexError("Layer ends after the end of the tile")
+                spans.append((layer_name_at(buffer, pos, pos + length), pos, pos + length))
+                pos += length
+            else:
+                pos = skip_field(buffer, pos, wire_type)
+    except (IndexError, ValueError) as e:
+        if(report is None):
+            raise
+        report("truncated_tile", "Tile is truncated or corrupt after {} layers: {}".format(len(spans), e))
+    return spans
+
+def command_bounds(cmds: List[int]) -> Tuple[int, int, int, int]:
+    "Bounding box (min_x, min_y, max_x, max_y) in tile coordinates of a geometry command stream."
+    min_x = min_y = max_x = max_y = None
+    cX = 0
+    cY = 0
+    cmds_pc = 0
+    while(cmds_pc < len(cmds)):
+        command_integer = cmds[cmds_pc]
+        command_id = command_integer & 0x07
+        command_count = command_integer >> 3
+        if(command_id == 1 or command_id == 2):
+            for i in range(command_count):
+                cX += unzigzag_coords(cmds[cmds_pc + 1])
+                cY += unzigzag_coords(cmds[cmds_pc + 2])
+                cmds_pc += 2
+                if(min_x is None):
+                    min_x = max_x = cX
+                    min_y = max_y = cY
+                else:
+                    if(cX < min_x): min_x = cX
+                    elif(cX > max_x): max_x = cX
+                    if(cY < min_y): min_y = cY
+                    elif(cY > max_y): max_y = cY
+        elif(command_id != 7):
+            # Unknown command, its parameter count is unknown as well.
+            break
+        cmds_pc += 1
+    if(min_x is None):
+        return (0, 0, 0, 0)
+    return (min_x, min_y, max_x, max_y)
+
+def command_counts(cmds: List[int]) -> Tuple[int, int]:
+    "Number of vertices and of parts (MoveTo commands, i.e. points, lines or rings) in a geometry command stream."
+    vertices = 0
+    parts = 0
+    cmds_pc = 0
+    while(cmds_pc < len(cmds)):
+        command_id = cmds[cmds_pc] & 0x07
+        command_count = cmds[cmds_pc] >> 3
+        if(command_id == 1 or command_id == 2):
+            vertices += command_count
+            if(command_id == 1):
+                parts += command_count
+            cmds_pc += 2 * command_count
+        cmds_pc += 1
+    return vertices, parts
+
+def morton_index(order: int, x: int, y: int) -> int:
+    "Position of cell (x, y) along a Z-order (Morton) curve."
+    d = 0
+    for bit in range(order):
+        d |= ((x >> bit) & 1) << (2 * bit)
+        d |= ((y >> bit) & 1) << (2 * bit + 1)
+    return d
+
+def hilbert_index(order: int, x: int, y: int) -> int:
+    "Position of cell (x, y) along a Hilbert curve covering a 2**order by 2**order grid."
+    n = 1 << order
+    d = 0
+    s = n >> 1
+    while(s > 0):
+        rx = 1 if (x & s) > 0 else 0
+        ry = 1 if (y & s) > 0 else 0
+        d += s * s * ((3 * rx) ^ ry)
+        if(ry == 0):
+            if(rx == 1):
+                x = n - 1 - x
+                y = n - 1 - y
+            x, y = y, x
+        s >>= 1
+    return d
+
+# Geometry types of vector tile features, the GeomType enum of the protobuf schema.
+GEOM_POINT = 1
+GEOM_LINESTRING = 2
+GEOM_POLYGON = 3
+EMPTY_GEOMETRY_MESSAGES = {
+    GEOM_POINT: "Point feature has no points.",
+    GEOM_LINESTRING: "LineString feature has no lines.",
+    GEOM_POLYGON: "Polygon feature has no exterior ring.",
+}
+
+def ring_is_exterior(ring: List[Tuple[int, int]]) -> bool:
+    "Exterior rings have a positive area in tile coordinates (y pointing down), interior rings a negative one."
+    return area_by_shoelace(ring) >= 0
+
+def geometry_parts(cmds: List[int], geom_type: int, report = None) -> List[List[Tuple[int, int]]]:
+    """Absolute tile coordinates of a feature's geometry, one part per point, line or ring. Rings are left open, ClosePath is implicit.
+    This is the one place geometry is validated, so every decoding path keeps and skips the same features. Problems are passed to report(problem, message) if given:
+    commands not allowed for the geometry type, LineTo or ClosePath before the first MoveTo, unclosed rings and interior rings before any exterior ring are skipped.
+    Lines with fewer than 2 distinct points and rings with fewer than 3 are degenerate and dropped, so no invalid GeoJSON is built from them.
+    Returns None for an unknown geometry type, a command stream that ends in the middle of a command, or when no geometry is left."""
+    if(report is None):
+        report = lambda problem, message: None
+    if(geom_type not in EMPTY_GEOMETRY_MESSAGES):
+        report("unknown_geometry_type", "Feature has unknown geometry type {}.".format(geom_type))
+        return None
+    try:
+        commands = expand_commands(cmds, report)
+    except IndexError:
+        report("truncated_geometry", "Geometry commands end in the middle of a command.")
+        return None
+
+    parts = []
+    closed = []
+    cX = 0
+    cY = 0
+    for command_id, x, y in commands:
+        if(geom_type == GEOM_POINT and command_id != 1):
+            report("unexpected_command", "Point feature contains a LineTo or ClosePath command.")
+            continue
+        if(len(parts) == 0 and command_id != 1):
+            report("missing_moveto", "LineTo or ClosePath before the first MoveTo.")
+            continue
+        if(command_id == 7):
+            if(geom_type == GEOM_LINESTRING):
+                report("unexpected_command", "ClosePath in a LineString feature is ignored.")
+            closed[-1] = True
+            continue
+        cX += unzigzag_coords(x)
+        cY += unzigzag_coords(y)
+        if(command_id == 1):
+            parts.append([(cX, cY)])
+            closed.append(False)
+        else:
+            parts[-1].append((cX, cY))
+            closed[-1] = False
+
+    if(geom_type == GEOM_POLYGON):
+        for is_closed in closed:
+            if(not is_closed):
+                report("unclosed_ring", "Polygon ring does not end with ClosePath.")
+    if(geom_type != GEOM_POINT):
+        min_points = 3 if geom_type == GEOM_POLYGON else 2
+        kept = []
+        for part in parts:
+            if(len(set(part)) < min_points):
+                report("degenerate_geometry", "{} with fewer than {} distinct points.".format("Ring" if geom_type == GEOM_POLYGON else "Line", min_points))
+            else:
+                kept.append(part)
+        parts = kept
+    if(geom_type == GEOM_POLYGON):
+        rings = []
+        for ring in parts:
+            if(len(rings) == 0 and not ring_is_exterior(ring)):
+                report("interior_before_exterior", "Interior ring found before any exterior ring.")
+                continue
+            rings.append(ring)
+        parts = rings
+
+    if(len(parts) == 0):
+        report("empty_geometry", EMPTY_GEOMETRY_MESSAGES[geom_type])
+        return None
+    return parts
+
+def tag_pairs(tags: List[int], num_keys: int, num_values: int, report = None) -> List[Tuple[int, int]]:
+    "(key, value) index pairs of a feature's tags. A trailing odd tag and pairs pointing past the keys or values are dropped and passed to report(problem, message) if given."
+    if(report is not None and len(tags) % 2 != 0):
+        report("odd_tags", "Feature has an odd number of tags, the last one is ignored.")
+    pairs = [(tags[i], tags[i + 1]) for i in range(0, len(tags) - 1, 2)]
+    valid = [(key, value) for key, value in pairs if key < num_keys and value < num_values]
+    if(report is not None and len(valid) < len(pairs)):
+        report("invalid_tag", "Feature tag refers to a key or value that does not exist.")
+    return valid
+
+def clip_segment(start: Tuple[int, int], end: Tuple[int, int], min_v: int, max_v: int) -> Tuple[Tuple[int, int], Tuple[int, int]]:
+    "Liang-Barsky clipping of a segment to the square [min_v, max_v]. New end points are rounded to tile coordinates, None if nothing is left."
+    x0, y0 = start
+    dx = end[0] - x0
+    dy = end[1] - y0
+    t0 = 0.0
+    t1 = 1.0
+    for p, q in ((-dx, x0 - min_v), (dx, max_v - x0), (-dy, y0 - min_v), (dy, max_v - y0)):
+        if(p == 0):
+            if(q < 0):
+                return None
+        elif(p < 0):
+            t0 = max(t0, q / p)
+        else:
+            t1 = min(t1, q / p)
+        if(t0 > t1):
+            return None
+    if(t0 > 0):
+        start = (round(x0 + t0 * dx), round(y0 + t0 * dy))
+    if(t1 < 1):
+        end = (round(x0 + t1 * dx), round(y0 + t1 * dy))
+    return (start, end)
+
+def clip_line(line: List[Tuple[int, int]], min_v: int, max_v: int) -> List[List[Tuple[int, int]]]:
+    "Clip a line to the square [min_v, max_v]. A line that leaves and re-enters the square is split into several parts."
+    parts = []
+    current = []
+    for i in range(len(line) - 1):
+        clipped = clip_segment(line[i], line[i + 1], min_v, max_v)
+        if(clipped is None):
+            continue
+        start, end = clipped
+        if(len(current) == 0 or current[-1] != start):
+            if(len(current) > 1):
+                parts.append(current)
+            current = [start]
+        current.append(end)
+        if(end != line[i + 1]):
+            parts.append(current)
+            current = []
+    if(len(current) > 1):
+        parts.append(current)
+    return parts
+
+def clip_ring(ring: List[Tuple[int, int]], min_v: int, max_v: int) -> List[Tuple[int, int]]:
+    "Sutherland-Hodgman clipping of a ring (without closing point) to the square [min_v, max_v]. Parts outside collapse onto the square's edges."
+    for axis, bound, keep_above in ((0, min_v, True), (0, max_v, False), (1, min_v, True), (1, max_v, False)):
+        if(len(ring) == 0):
+            break
+        inside = [(point[axis] >= bound) if keep_above else (point[axis] <= bound) for point in ring]
+        clipped = []
+        previous = ring[-1]
+        previous_inside = inside[-1]
+        for point, point_inside in zip(ring, inside):
+            if(point_inside != previous_inside):
+                t = (bound - previous[axis]) / (point[axis] - previous[axis])
+                other = round(previous[1 - axis] + t * (point[1 - axis] - previous[1 - axis]))
+                clipped.append((bound, other) if axis == 0 else (other, bound))
+            if(point_inside):
+                clipped.append(point)
+            previous = point
+            previous_inside = point_inside
+        ring = clipped
+    return ring
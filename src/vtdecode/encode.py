@@ -0,0 +1,96 @@
+import argparse
+import json
+import os
+from .encoder.TileEncoder import TileEncoder
+from .encoder.filter import filter_layers, filter_features, select_layers
+from .decoder.DecodeStats import DecodeStats, stage
+
+def load_layers(filename: str, layer_name: str = None):
+    "Load vtdecode JSON output: either a dict of layers, or a single FeatureCollection named after layer_name or the file."
+    with open(filename, 'r') as f:
+        content = json.load(f)
+    if(content.get("type") == "FeatureCollection"):
+        if(layer_name is None):
+            layer_name = os.path.splitext(os.path.basename(filename))[0]
+        return {layer_name: content}
+    return content
+
+def drop_properties(layer_content, drop_attributes):
+    "Remove attributes from every feature of a FeatureCollection."
+    for feature in layer_content["features"]:
+        for container in (feature, feature.get("geometry") or dict()):
+            properties = container.get("properties")
+            if(properties):
+                for attribute in drop_attributes:
+                    properties.pop(attribute, None)
+
+def main():
+    parser = argparse.ArgumentParser(description="Encode vtdecode GeoJSON output back into a Vector Tile Protobuf file, or filter an existing Vector Tile.")
+    parser.add_argument("-i", "--input", required=True, dest='input_file', help="Input file. *.json files are encoded, anything else is treated as a vector tile and filtered.")
+    parser.add_argument("-o", "--output", required=True, dest='output_file', help="Output file")
+
+    parser.add_argument("-x", dest = "tile_x", help="X coordinate of tile, required for JSON input", required=False, type=int)
+    parser.add_argument("-y", dest = "tile_y", help="Y coordinate of tile, required for JSON input", required=False, type=int)
+    parser.add_argument("-z", dest = "tile_z", help="Zoom level of tile, required for JSON input", required=False, type=int)
+    parser.add_argument("--extent", dest = "extent", help="Tile extent used when encoding JSON input.", default=4096, type=int)
+    parser.add_argument("--layer-name", dest = "layer_name", help="Layer name for JSON input containing a single FeatureCollection. Defaults to the file name.", required=False)
+    parser.add_argument("--layer", dest = "layers", help="Only keep the given layer. May be repeated.", action="append", required=False)
+    parser.add_argument("--drop-layer", dest = "drop_layers", help="Drop the given layer. May be repeated.", action="append", required=False)
+    parser.add_argument("--drop-attribute", dest = "drop_attributes", help="Drop the given attribute from all features. May be repeated.", action="append", required=False)
+    parser.add_argument("--stats", dest = "stats", help="Print per-stage timings and counters, or write them as JSON to the given file.", nargs="?", const="-", required=False)
+    args = parser.parse_args()
+    stats = DecodeStats() if args.stats is not None else None
+
+    if(args.input_file.endswith(".json")):
+        if(not (args.tile_x is not None and args.tile_y is not None and args.tile_z is not None)):
+            print("Please provide tile coordinates.")
+            exit(1)
+        with stage(stats, "read"):
+            layers = load_layers(args.input_file, args.layer_name)
+        encoder = TileEncoder(args.tile_x, args.tile_y, args.tile_z, args.extent)
+        for layer_name in select_layers(list(layers.keys()), args.layers, args.drop_layers):
+            if(args.drop_attributes is not None):
+                drop_properties(layers[layer_name], args.drop_attributes)
+            with stage(stats, "encode", layer_name):
+                encoder.add_layer(layer_name, layers[layer_name])
+            if(stats is not None):
+                stats.count("features", len(layers[layer_name]["features"]), layer_name)
+        with stage(stats, "encode"):
+            data = encoder.encode()
+    else:
+        with stage(stats, "read"):
+            with open(args.input_file, 'rb') as f:
+                data = f.read()
+        if(stats is not None):
+            stats.count("bytes", len(data))
+        problems = dict()
+
+        def report(problem: str, message: str) -> None:
+            problems[problem] = problems.get(problem, 0) + 1
+            if(stats is not None):
+                stats.count("problem_" + problem, 1)
+
+        from google.protobuf.message import DecodeError
+        try:
+            with stage(stats, "filter"):
+                if(args.drop_attributes is not None):
+                    data = filter_features(data, args.layers, args.drop_layers, drop_attributes=args.drop_attributes, report=report)
+                else:
+                    data = filter_layers(data, args.layers, args.drop_layers)
+        except (DecodeError, IndexError, ValueError) as e:
+            print("Malformed tile: {}".format(e))
+            exit(1)
+        if(len(problems) > 0):
+            print("Dropped malformed tags: " + ", ".join("{} ({})".format(problem, count) for problem, count in sorted(problems.items())))
+
+    with stage(stats, "write"):
+        with open(args.output_file, 'wb') as f:
+            f.write(data)
+    if(stats is not None):
+        stats.count("output_bytes", len(data))
+    print("Wrote vector tile to {}".format(args.output_file))
+    if(stats is not None):
+        stats.report(args.stats)
+
+if __name__ == '__main__':
+    main()
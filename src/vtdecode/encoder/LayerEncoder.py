@@ -0,0 +1,134 @@
+from ..decoder import vector_tile_pb2 as vt_proto
+from ..decoder.utils import latlon_to_offset
+from ..writer.utils import feature_properties
+from .utils import encode_points, encode_lines, prepare_ring, remove_repeated_points
+from typing import Dict, Tuple, List
+
+class LayerEncoder:
+    def __init__(self, name: str, xtile: int = 0, ytile: int = 0, zoom: int = 0, extent: int = 4096, version: int = 2):
+        "Build one Tile.Layer, the inverse of LayerDecoder. Tile coordinates are only needed to encode lon/lat features."
+        self.layer = vt_proto.Tile.Layer()
+        self.layer.name = name
+        self.layer.extent = extent
+        self.layer.version = version
+        self.xtile = xtile
+        self.ytile = ytile
+        self.zoom = zoom
+        self.extent = extent
+        self.key_index = dict()
+        self.value_index = dict()
+
+    # Utility Functions.
+    def latlon_to_tile(self, lon: float, lat: float) -> Tuple[int, int]:
+        x, y = latlon_to_offset(self.xtile, self.ytile, self.zoom, lon, lat, self.extent)
+        return (int(round(x)), int(round(y)))
+
+    def encode_key(self, key: str) -> int:
+        if(key not in self.key_index):
+            self.key_index[key] = len(self.layer.keys)
+            self.layer.keys.append(key)
+        return self.key_index[key]
+
+    def encode_value(self, value) -> int:
+        # bool is an int subclass and True == 1, so the type is part of the dictionary key.
+        value_key = (type(value), value)
+        if(value_key not in self.value_index):
+            encoded = self.layer.values.add()
+            if(isinstance(value, bool)):
+                encoded.bool_value = value
+            elif(isinstance(value, int)):
+                if(value < 0):
+                    encoded.sint_value = value
+                else:
+                    encoded.uint_value = value
+            elif(isinstance(value, float)):
+                encoded.double_value = value
+            else:
+                encoded.string_value = str(value)
+            self.value_index[value_key] = len(self.layer.values) - 1
+        return self.value_index[value_key]
+
+    def encode_tags(self, properties: Dict) -> List[int]:
+        tags = []
+        for key, value in properties.items():
+            if(value is None or isinstance(value, (dict, list))):
+                continue
+            tags.append(self.encode_key(key))
+            tags.append(self.encode_value(value))
+        return tags
+
+    # Encoder functions. Geometry is given in tile coordinates.
+    def add_points(self, points: List[Tuple[int, int]], properties: Dict, feature_id: int = None) -> None:
+        if(len(points) == 0):
+            return
+        feature = self.layer.features.add()
+        if(feature_id is not None):
+            feature.id = feature_id
+        feature.type = vt_proto.Tile.GeomType.POINT
+        feature.tags.extend(self.encode_tags(properties))
+        feature.geometry.extend(encode_points(points))
+
+    def add_lines(self, lines: List[List[Tuple[int, int]]], properties: Dict, feature_id: int = None) -> None:
+        lines = [line for line in (remove_repeated_points(line) for line in lines) if len(line) >= 2]
+        if(len(lines) == 0):
+            return
+        feature = self.layer.features.add()
+        if(feature_id is not None):
+            feature.id = feature_id
+        feature.type = vt_proto.Tile.GeomType.LINESTRING
+        feature.tags.extend(self.encode_tags(properties))
+        feature.geometry.extend(encode_lines(lines, False))
+
+    def add_polygons(self, polygons: List[List[List[Tuple[int, int]]]], properties: Dict, feature_id: int = None) -> None:
+        "Each polygon is a list of rings, the first one exterior. Winding order is fixed as required by the specification."
+        rings = []
+        for polygon in polygons:
+            exterior = prepare_ring(polygon[0], True) if len(polygon) > 0 else None
+            if(exterior is None):
+                continue
+            rings.append(exterior)
+            for interior in polygon[1:]:
+                interior = prepare_ring(interior, False)
+                if(interior is not None):
+                    rings.append(interior)
+        if(len(rings) == 0):
+            return
+        feature = self.layer.features.add()
+        if(feature_id is not None):
+            feature.id = feature_id
+        feature.type = vt_proto.Tile.GeomType.POLYGON
+        feature.tags.extend(self.encode_tags(properties))
+        feature.geometry.extend(encode_lines(rings, True))
+
+    def add_feature(self, feature) -> None:
+        "Add a GeoJSON feature in lon/lat, as produced by LayerDecoder."
+        geometry = feature["geometry"]
+        if(geometry is None):
+            return
+        properties = feature_properties(feature)
+        feature_id = feature.get("id")
+        if(not isinstance(feature_id, int) or isinstance(feature_id, bool) or feature_id < 0):
+            feature_id = None
+
+        geom_type = geometry["type"]
+        coordinates = geometry["coordinates"]
+        project = lambda positions: [self.latlon_to_tile(p[0], p[1]) for p in positions]
+        if(geom_type == "Point"):
+            self.add_points(project([coordinates]), properties, feature_id)
+        elif(geom_type == "MultiPoint"):
+            self.add_points(project(coordinates), properties, feature_id)
+        elif(geom_type == "LineString"):
+            self.add_lines([project(coordinates)], properties, feature_id)
+        elif(geom_type == "MultiLineString"):
+            self.add_lines([project(line) for line in coordinates], properties, feature_id)
+        elif(geom_type == "Polygon"):
+            self.add_polygons([[project(ring) for ring in coordinates]], properties, feature_id)
+        elif(geom_type == "MultiPolygon"):
+            self.add_polygons([[project(ring) for ring in polygon] for polygon in coordinates], properties, feature_id)
+
+    def add_features(self, features) -> None:
+        for feature in features:
+            self.add_feature(feature)
+
+    def encode(self) -> vt_proto.Tile.Layer:
+        return self.layer
@@ -0,0 +1,32 @@
+from ..decoder import vector_tile_pb2 as vt_proto
+from .LayerEncoder import LayerEncoder
+from typing import Dict, Tuple, List
+
+class TileEncoder:
+    def __init__(self, xtile: int, ytile: int, zoom: int, extent: int = 4096):
+        "Encode decoded layers (FeatureCollections in lon/lat) back into a vector tile."
+        self.xtile = xtile
+        self.ytile = ytile
+        self.zoom = zoom
+        self.extent = extent
+        self.layers = dict()
+
+    def layer(self, layer_name: str) -> LayerEncoder:
+        "The encoder of a layer, created on first use."
+        if(layer_name not in self.layers):
+            self.layers[layer_name] = LayerEncoder(layer_name, self.xtile, self.ytile, self.zoom, self.extent)
+        return self.layers[layer_name]
+
+    def add_layer(self, layer_name: str, layer_content) -> None:
+        self.layer(layer_name).add_features(layer_content["features"])
+
+    def add_layers(self, decoded: Dict) -> None:
+        "Add every layer of a decoder result, i.e. a dict of layer name to FeatureCollection."
+        for layer_name, layer_content in decoded.items():
+            self.add_layer(layer_name, layer_content)
+
+    def encode(self) -> bytes:
+        tile = vt_proto.Tile()
+        for layer_encoder in self.layers.values():
+            tile.layers.append(layer_encoder.encode())
+        return tile.SerializeToString()
@@ -0,0 +1,94 @@
+from ..decoder import vector_tile_pb2 as vt_proto
+from ..decoder.utils import iter_layer_spans, tag_pairs
+from typing import Dict, Tuple, List, Callable
+
+def select_layers(names: List[str], keep_layers: List[str] = None, drop_layers: List[str] = None) -> List[str]:
+    return [name for name in names if (keep_layers is None or name in keep_layers) and (drop_layers is None or name not in drop_layers)]
+
+def filter_layers(data: bytes, keep_layers: List[str] = None, drop_layers: List[str] = None) -> bytes:
+    """Drop whole layers from an encoded tile. Kept layers are copied byte for byte, without parsing
+    features or geometry, so this runs at close to memory copy speed."""
+    buffer = memoryview(data)
+    spans = iter_layer_spans(buffer)
+    selected = set(select_layers([name for name, _, _ in spans], keep_layers, drop_layers))
+
+    output = bytearray()
+    for name, start, end in spans:
+        if(name not in selected):
+            continue
+        output.append(3 << 3 | 2)
+        length = end - start
+        while(length >= 0x80):
+            output.append((length & 0x7f) | 0x80)
+            length >>= 7
+        output.append(length)
+        output += buffer[start:end]
+    return bytes(output)
+
+def _compact_dictionaries(layer: vt_proto.Tile.Layer) -> None:
+    "Remove keys and values no longer referenced by any feature, renumbering the tags."
+    used_keys = sorted({feature.tags[i] for feature in layer.features for i in range(0, len(feature.tags) - 1, 2)})
+    used_values = sorted({feature.tags[i] for feature in layer.features for i in range(1, len(feature.tags), 2)})
+    key_map = {old: new for new, old in enumerate(used_keys)}
+    value_map = {old: new for new, old in enumerate(used_values)}
+
+    keys = [layer.keys[i] for i in used_keys]
+    values = [layer.values[i] for i in used_values]
+    del layer.keys[:]
+    layer.keys.extend(keys)
+    # Copy before clearing, the repeated field owns the messages.
+    values = [vt_proto.Tile.Value.FromString(value.SerializeToString()) for value in values]
+    del layer.values[:]
+    layer.values.extend(values)
+
+    for feature in layer.features:
+        tags = list(feature.tags)
+        del feature.tags[:]
+        for i in range(0, len(tags) - 1, 2):
+            feature.tags.append(key_map[tags[i]])
+            feature.tags.append(value_map[tags[i + 1]])
+
+def filter_features(data: bytes, keep_layers: List[str] = None, drop_layers: List[str] = None,
+                    feature_filter: Callable[[str, Dict], bool] = None, drop_attributes: List[str] = None, report = None) -> bytes:
+    """Re-encode a tile with layers, features or attributes dropped. Geometry command streams are copied as they are,
+    only the tags are looked at. feature_filter receives the layer name and the properties of a feature and returns
+    whether to keep it. Tags pointing past the layer's keys or values are dropped and passed to report(problem, message) if given."""
+    tile = vt_proto.Tile.FromString(data)
+    selected = set(select_layers([layer.name for layer in tile.layers], keep_layers, drop_layers))
+    output = vt_proto.Tile()
+
+    for layer in tile.layers:
+        if(layer.name not in selected):
+            continue
+        if(feature_filter is None and drop_attributes is None):
+            output.layers.append(layer)
+            continue
+
+        values = None
+        if(feature_filter is not None):
+            # Reuse the decoder's value conversion, without decoding any geometry.
+            from ..decoder.LayerDecoder import LayerDecoder
+            values = LayerDecoder.decode_values(layer)
+        dropped_keys = set(i for i, key in enumerate(layer.keys) if drop_attributes is not None and key in drop_attributes)
+
+        filtered = vt_proto.Tile.Layer()
+        filtered.CopyFrom(layer)
+        del filtered.features[:]
+        for feature in layer.features:
+            pairs = tag_pairs(feature.tags, len(layer.keys), len(layer.values), report)
+            if(feature_filter is not None):
+                properties = {layer.keys[key]: values[value] for key, value in pairs}
+                if(not feature_filter(layer.name, properties)):
+                    continue
+            kept = filtered.features.add()
+            kept.CopyFrom(feature)
+            del kept.tags[:]
+            for key, value in pairs:
+                if(key not in dropped_keys):
+                    kept.tags.append(key)
+                    kept.tags.append(value)
+
+        _compact_dictionaries(filtered)
+        output.layers.append(filtered)
+
+    return output.SerializeToString()
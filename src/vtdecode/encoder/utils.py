@@ -0,0 +1,67 @@
+from typing import Dict, Tuple, List
+from ..decoder.utils import area_by_shoelace
+
+def zigzag_coords(value: int) -> int:
+    "Inverse of unzigzag_coords."
+    return (value << 1) ^ (value >> 63)
+
+def command_integer(command_id: int, command_count: int) -> int:
+    return (command_id & 0x07) | (command_count << 3)
+
+def remove_repeated_points(points: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    "Drop consecutive duplicates, which would encode as zero-length LineTo parameters."
+    result = []
+    for point in points:
+        if(len(result) == 0 or result[-1] != point):
+            result.append(point)
+    return result
+
+def encode_points(points: List[Tuple[int, int]]) -> List[int]:
+    "Encode points as a single MoveTo command."
+    geometry = [command_integer(1, len(points))]
+    cX = 0
+    cY = 0
+    for x, y in points:
+        geometry.append(zigzag_coords(x - cX))
+        geometry.append(zigzag_coords(y - cY))
+        cX = x
+        cY = y
+    return geometry
+
+def encode_lines(parts: List[List[Tuple[int, int]]], close: bool) -> List[int]:
+    "Encode lines (or rings, with close=True) as MoveTo, LineTo and ClosePath commands. The cursor carries over between parts."
+    geometry = []
+    cX = 0
+    cY = 0
+    for part in parts:
+        x, y = part[0]
+        geometry.append(command_integer(1, 1))
+        geometry.append(zigzag_coords(x - cX))
+        geometry.append(zigzag_coords(y - cY))
+        cX = x
+        cY = y
+        geometry.append(command_integer(2, len(part) - 1))
+        for x, y in part[1:]:
+            geometry.append(zigzag_coords(x - cX))
+            geometry.append(zigzag_coords(y - cY))
+            cX = x
+            cY = y
+        if(close):
+            geometry.append(command_integer(7, 1))
+    return geometry
+
+def prepare_ring(ring: List[Tuple[int, int]], exterior: bool) -> List[Tuple[int, int]]:
+    """Remove the closing point and fix the winding order of a ring.
+    Exterior rings have a positive area in tile coordinates (clockwise on screen), interior rings a negative one.
+    Returns None for rings that collapsed to fewer than 3 points."""
+    ring = remove_repeated_points(ring)
+    if(len(ring) > 1 and ring[0] == ring[-1]):
+        ring = ring[:-1]
+    if(len(ring) < 3):
+        return None
+    area = area_by_shoelace(ring)
+    if(area == 0):
+        return None
+    if((area > 0) != exterior):
+        ring = ring[::-1]
+    return ring
@@ -0,0 +1,105 @@
+import json
+import threading
+import time
+from typing import Dict, Tuple, List
+from .decoder.MalformedTileError import MalformedTileError
+
+# A tile fails to fetch, read, decode or write. Fetch and write errors are usually transient and marked retryable,
+# an input file that is missing or cannot be read stays so until it is replaced.
+RETRYABLE_STAGES = {"fetch", "write"}
+
+def tile_key(tile: Tuple[int, int, int]) -> str:
+    return "{}/{}/{}".format(*tile)
+
+def error_stage(error: Exception, source: str = None) -> str:
+    """Stage a decode_and_write style call most likely failed in: read for I/O errors on the input file source,
+    write for other I/O errors, decode otherwise."""
+    if(isinstance(error, OSError)):
+        if(source is not None and error.filename == source):
+            return "read"
+        return "write"
+    return "decode"
+
+def failure_record(tile: Tuple[int, int, int], stage: str, error: Exception, source: str = None) -> Dict:
+    "JSON serializable record of a tile that could not be decoded."
+    record = {
+        "tile": tile_key(tile), "status": "failed", "stage": stage,
+        "error": str(error), "error_type": type(error).__name__, "retryable": stage in RETRYABLE_STAGES,
+    }
+    if(isinstance(error, MalformedTileError)):
+        record["problem"] = error.problem
+        if(error.layer is not None):
+            record["layer"] = error.layer
+    if(source is not None):
+        record["source"] = source
+    return record
+
+def load_failed_tiles(filename: str) -> List[Tuple[int, int, int]]:
+    "(zoom, x, y) of every tile recorded as failed in a failure log, in order and without duplicates."
+    tiles = []
+    seen = set()
+    with open(filename) as f:
+        for line in f:
+            if(line.strip() == ""):
+                continue
+            record = json.loads(line)
+            if(record.get("status") != "failed"):
+                continue
+            tile = tuple(int(c) for c in record["tile"].split("/"))
+            if(tile not in seen):
+                seen.add(tile)
+                tiles.append(tile)
+    return tiles
+
+class FailureLog:
+    def __init__(self, filename: str = None):
+        """Per-tile error records of a batch run, written as one JSON object per line so the run can go on after a tile fails.
+        Failed tiles were not written, recovered tiles were written after skipping malformed parts, with the problems counted.
+        Without filename tiles are only counted. Safe to share between threads."""
+        self.filename = filename
+        self.file = open(filename, 'w') if filename is not None else None
+        self.lock = threading.Lock()
+        self.failed = 0
+        self.recovered = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, record: Dict) -> None:
+        record["time"] = time.strftime("%Y-%m-%dT%H:%M:%S%z")
+        with self.lock:
+            if(self.file is not None):
+                self.file.write(json.dumps(record) + "\n")
+                # Flushed per record: the log must be complete even if the run is killed.
+                self.file.flush()
+
+    def record_failure(self, tile: Tuple[int, int, int], stage: str, error: Exception, source: str = None) -> None:
+        print("Failed to {} tile {}: {}".format(stage, tile_key(tile), error))
+        with self.lock:
+            self.failed += 1
+        self.write(failure_record(tile, stage, error, source))
+
+    def record_recovered(self, tile: Tuple[int, int, int], problems: Dict[str, int], source: str = None) -> None:
+        "A tile written after skipping malformed parts. Nothing is recorded if problems is empty."
+        if(len(problems) == 0):
+            return
+        with self.lock:
+            self.recovered += 1
+        record = {"tile": tile_key(tile), "status": "recovered", "problems": problems}
+        if(source is not None):
+            record["source"] = source
+        self.write(record)
+
+    def summary(self) -> str:
+        text = "{} tiles failed, {} tiles had malformed parts skipped.".format(self.failed, self.recovered)
+        if(self.filename is not None and self.failed + self.recovered > 0):
+            text += " See {}.".format(self.filename)
+        return text
+
+    def close(self) -> None:
+        if(self.file is not None):
+            self.file.close()
+            self.file = None
@@ -0,0 +1,461 @@
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import threading
+import time
+from typing import Dict, Tuple, List
+from .decoder.BytesDecoder import BytesDecoder
+from .decoder.DecodeStats import DecodeStats, stage
+from .writer.utils import OUTPUT_FORMATS, FORMAT_EXTENSIONS, layer_filename, open_layer_writer, write_layer
+from .planner import CURVES, parse_bbox, load_polygons, plan_tiles, plan_range
+from .providers import TileProvider
+from .failures import FailureLog, error_stage, load_failed_tiles
+
+class FetchError(Exception):
+    def __init__(self, status: int):
+        "The server did not answer with a 2xx status after all retries."
+        super().__init__(status)
+        self.status = status
+
+    def __str__(self) -> str:
+        return "HTTP status {}".format(self.status)
+
+class RateLimiter:
+    def __init__(self, rate: float):
+        "Space out requests so that at most `rate` of them start per second."
+        self.interval = 1.0 / rate
+        self.next_slot = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+        async with self.lock:
+            now = time.monotonic()
+            delay = self.next_slot - now
+            self.next_slot = max(now, self.next_slot) + self.interval
+        if(delay > 0):
+            await asyncio.sleep(delay)
+
+class FetchEngine:
+    def __init__(self, concurrency: int = 8, attempts: int = 5, rate_limits: Dict[str, float] = None):
+        """One HTTP client shared by every provider. Connections are pooled and kept alive across requests,
+        rate limits are tracked per provider."""
+        self.concurrency = max(concurrency, 1)
+        self.attempts = attempts
+        self.rate_limits = dict() if rate_limits is None else rate_limits
+        self.limiters = dict()
+        self.client = None
+
+    async def __aenter__(self):
+        from aiohttp import TCPConnector
+        from aiohttp_retry import RetryClient, ExponentialRetry
+        connector = TCPConnector(limit=self.concurrency, keepalive_timeout=30, ttl_dns_cache=300)
+        # 429 and 5xx responses are retried with exponential backoff.
+        retry_options = ExponentialRetry(attempts=self.attempts, start_timeout=0.5, max_timeout=10, statuses={429})
+        self.client = RetryClient(raise_for_status=False, retry_options=retry_options, connector=connector)
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.client.close()
+        self.client = None
+
+    def _limiter(self, provider: TileProvider) -> RateLimiter:
+        if(provider.name not in self.limiters):
+            rate = self.rate_limits.get(provider.name, provider.rate_limit)
+            self.limiters[provider.name] = RateLimiter(rate) if rate is not None and rate > 0 else None
+        return self.limiters[provider.name]
+
+    async def fetch(self, provider: TileProvider, url: str) -> bytes:
+        "Fetch a tile. Raises FetchError if the server did not answer with a 2xx status after all retries."
+        limiter = self._limiter(provider)
+        if(limiter is not None):
+            await limiter.wait()
+        async with self.client.get(url) as response:
+            if(response.status // 100 == 2):
+                return await response.read()
+            raise FetchError(response.status)
+
+def decode_in_process(options: Dict, record_stats: bool, zoom: int, xtile: int, ytile: int, body: bytes) -> Tuple[object, List, Dict[str, int]]:
+    """Decode a tile in a worker process. Tiles written on their own are written by the worker, layers of merged outputs
+    are handed back as FlatLayers in shared memory instead of being pickled, aggregates as a TileAggregate.
+    Returns what is handed back (None, the shared memory handles or the aggregate, see TileOutput.add_worker_result),
+    the worker's recorded statistics and the counts of malformed parts skipped."""
+    stats = DecodeStats(record=True) if record_stats else None
+    if(options["aggregate"] is not None):
+        decoder = BytesDecoder(xtile, ytile, zoom, body, stats=stats, strict=options["strict"])
+        return decoder.aggregate(options["aggregate"]), (stats.events if stats is not None else None), decoder.problems
+    handles = None
+    if(options["merge"]):
+        handles = []
+        from .writer.FlatLayer import FlatLayer
+        decoder = BytesDecoder(xtile, ytile, zoom, body, stats=stats, strict=options["strict"])
+        try:
+            for layer_name, layer_content in decoder.iter_layers():
+                with stage(stats, "handoff", layer_name):
+                    flat = FlatLayer.from_features(layer_name, layer_content["features"], options["fmt"] == "json", options["json_indent"])
+                    handles.append(flat.to_shared_memory())
+        except Exception:
+            # Free the blocks handed over so far, nothing of a failed tile is merged.
+            for handle in handles:
+                FlatLayer.from_shared_memory(handle)
+            raise
+        problems = decoder.problems
+    else:
+        problems = TileOutput(**options, stats=stats).decode_and_write(zoom, xtile, ytile, body)
+    return handles, (stats.events if stats is not None else None), problems
+
+class TileOutput:
+    def __init__(self, tile_name: str, output_dir: str = None, output_filename: str = None, json_indent: int = 0, split_layers: bool = False, fmt: str = "json", merge: bool = False, stats: DecodeStats = None, strict: bool = False, aggregate: List[str] = None):
+        """Write decoded tiles to files, either one file (or one per layer) per tile, or merged per layer and zoom level. With strict, malformed tiles fail instead of being decoded partially.
+        With aggregate, a list of group_by properties, only statistics are collected, and written as one JSON file with every tile and the total on close()."""
+        self.tile_name = tile_name
+        self.output_dir = output_dir
+        self.output_filename = output_filename
+        self.json_indent = json_indent
+        self.split_layers = split_layers
+        self.fmt = fmt
+        self.merged_writers = dict() if merge else None
+        self.lock = threading.Lock()
+        # With plan(), the layers of tiles finished out of order wait in finished_tiles until every tile planned before them is merged.
+        self.tile_order = None
+        self.next_tile = 0
+        self.finished_tiles = dict()
+        self.stats = stats
+        self.strict = strict
+        self.aggregates = None
+        if(aggregate is not None):
+            from .decoder.TileAggregate import RangeAggregate
+            self.aggregates = RangeAggregate(aggregate)
+
+    def options(self) -> Dict:
+        "Constructor arguments except stats, to create the same output in a worker process."
+        return {
+            "tile_name": self.tile_name, "output_dir": self.output_dir, "output_filename": self.output_filename, "json_indent": self.json_indent,
+            "split_layers": self.split_layers, "fmt": self.fmt, "merge": self.merged_writers is not None, "strict": self.strict,
+            "aggregate": self.aggregates.group_by if self.aggregates is not None else None,
+        }
+
+    def per_layer(self) -> bool:
+        "Whether layers are written independently of each other."
+        return self.merged_writers is not None or self.split_layers or self.fmt != "json"
+
+    def merged_writer(self, zoom: int, layer_name: str):
+        "Writer of a layer merged across tiles. Must be called with self.lock held."
+        if((zoom, layer_name) not in self.merged_writers):
+            output_filename = os.path.join(self.output_dir, f"{self.tile_name}-{zoom}-{layer_name}{FORMAT_EXTENSIONS[self.fmt]}")
+            self.merged_writers[(zoom, layer_name)] = open_layer_writer(output_filename, self.fmt, layer_name, self.json_indent)
+        return self.merged_writers[(zoom, layer_name)]
+
+    def plan(self, tiles: List[Tuple[int, int, int]]) -> None:
+        """Merge tiles in the order of tiles, whatever order they finish decoding in, so merged files do not depend on timing.
+        Every planned tile must then be passed to finish_tile, or to skip_tile if it failed."""
+        if(self.merged_writers is not None):
+            self.tile_order = list(tiles)
+
+    def merge_layers(self, zoom: int, layers: List) -> None:
+        "Append the decoded layers of a tile, (name, FeatureCollection) pairs or FlatLayers, to the merged files. Must be called with self.lock held."
+        for layer in layers:
+            if(isinstance(layer, tuple)):
+                layer_name, layer_content = layer
+                with stage(self.stats, "write", layer_name):
+                    self.merged_writer(zoom, layer_name).add_features(layer_content["features"])
+            else:
+                with stage(self.stats, "write", layer.name):
+                    self.merged_writer(zoom, layer.name).add_flat_layer(layer)
+
+    def finish_tile(self, tile: Tuple[int, int, int], layers: List) -> None:
+        "Merge the decoded layers of a tile, right away without a plan, otherwise once every tile planned before it is finished."
+        with self.lock:
+            if(self.tile_order is None):
+                self.merge_layers(tile[0], layers)
+                return
+            if(layers is None):
+                # A skipped tile whose layers are already in, a merge of other tiles failed while it was waiting.
+                if(tile in self.finished_tiles):
+                    return
+                layers = []
+            self.finished_tiles[tile] = layers
+            while(self.next_tile < len(self.tile_order) and self.tile_order[self.next_tile] in self.finished_tiles):
+                ready = self.tile_order[self.next_tile]
+                self.next_tile += 1
+                self.merge_layers(ready[0], self.finished_tiles.pop(ready))
+
+    def skip_tile(self, tile: Tuple[int, int, int]) -> None:
+        "A planned tile failed, tiles planned after it need not wait for it."
+        if(self.tile_order is not None):
+            self.finish_tile(tile, None)
+
+    def add_flat_layers(self, zoom: int, xtile: int, ytile: int, handles: List) -> None:
+        "Merge the layers a worker process handed over through shared memory."
+        from .writer.FlatLayer import FlatLayer
+        # Copy every layer out first, so no shared memory block is left behind if writing fails.
+        flat_layers = [FlatLayer.from_shared_memory(handle) for handle in handles]
+        self.finish_tile((zoom, xtile, ytile), flat_layers)
+
+    def add_worker_result(self, zoom: int, xtile: int, ytile: int, result) -> None:
+        "Take over what decode_in_process handed back: an aggregate, or the shared memory handles of merged layers."
+        if(self.aggregates is not None):
+            self.aggregates.add((zoom, xtile, ytile), result)
+        else:
+            self.add_flat_layers(zoom, xtile, ytile, result)
+
+    def write_layer(self, zoom: int, xtile: int, ytile: int, layer_name: str, layer_content) -> None:
+        if(self.output_filename is not None):
+            output_filename = layer_filename(self.output_filename, layer_name, self.fmt)
+        else:
+            output_filename = os.path.join(self.output_dir, f"{self.tile_name}-{zoom}-{xtile}-{ytile}-{layer_name}{FORMAT_EXTENSIONS[self.fmt]}")
+        print("Writing layer {} to {}".format(layer_name, output_filename))
+        write_layer(output_filename, self.fmt, layer_name, layer_content, self.json_indent)
+
+    def write(self, zoom: int, xtile: int, ytile: int, result) -> None:
+        if(self.per_layer()):
+            for layer_name, layer_content in result.items():
+                self.write_layer(zoom, xtile, ytile, layer_name, layer_content)
+        else:
+            if(self.output_filename is not None):
+                output_filename = self.output_filename
+            else:
+                output_filename = os.path.join(self.output_dir, f"{self.tile_name}-{zoom}-{xtile}-{ytile}.json")
+            with open(output_filename, 'w') as f:
+                json.dump(result, f, indent=self.json_indent if self.json_indent > 0 else None)
+            print(f"Writing all layers to {output_filename}")
+
+    def close(self) -> None:
+        if(self.aggregates is not None):
+            if(self.output_filename is not None):
+                output_filename = self.output_filename
+            else:
+                output_filename = os.path.join(self.output_dir, f"{self.tile_name}-aggregate.json")
+            print("Writing aggregate of {} tiles to {}".format(len(self.aggregates.tiles), output_filename))
+            with stage(self.stats, "write"):
+                with open(output_filename, 'w') as f:
+                    json.dump(self.aggregates.summary(), f, indent=self.json_indent if self.json_indent > 0 else None)
+        if(self.merged_writers is not None):
+            with self.lock:
+                # Tiles finished but never reached in the plan, after a planned tile went missing, are merged in plan order.
+                for tile in sorted(self.finished_tiles, key=lambda tile: self.tile_order.index(tile) if tile in self.tile_order else len(self.tile_order)):
+                    self.merge_layers(tile[0], self.finished_tiles[tile])
+                self.finished_tiles.clear()
+            for (zoom, layer_name), writer in self.merged_writers.items():
+                print("Writing merged layer {} to {}".format(layer_name, writer.filename))
+                with stage(self.stats, "write"):
+                    writer.close()
+
+    def decode_and_write(self, zoom: int, xtile: int, ytile: int, body: bytes) -> Dict[str, int]:
+        "Returns the counts of malformed parts skipped. Raises MalformedTileError in strict mode."
+        decoder = BytesDecoder(xtile, ytile, zoom, body, stats=self.stats, strict=self.strict)
+        if(self.aggregates is not None):
+            self.aggregates.add((zoom, xtile, ytile), decoder.aggregate(self.aggregates.group_by))
+        elif(self.merged_writers is not None):
+            # Decode the whole tile before merging any of it, so a tile that fails leaves nothing behind in the merged files.
+            self.finish_tile((zoom, xtile, ytile), list(decoder.iter_layers()))
+        elif(self.per_layer()):
+            # Write each layer as soon as it is decoded, so at most one decoded layer per tile is alive.
+            for layer_name, layer_content in decoder.iter_layers():
+                with stage(self.stats, "write", layer_name):
+                    self.write_layer(zoom, xtile, ytile, layer_name, layer_content)
+        else:
+            result = decoder.decode()
+            with stage(self.stats, "write"):
+                self.write(zoom, xtile, ytile, result)
+        return decoder.problems
+
+def track_worker_result(future) -> None:
+    """Take over the shared memory blocks of a worker's merged layers as soon as its result arrives, even if nobody reads it any more
+    because the run was interrupted, so they are freed at exit at the latest."""
+    if(future.cancelled() or future.exception() is not None):
+        return
+    result = future.result()[0]
+    if(isinstance(result, list)):
+        from .writer.FlatLayer import FlatLayer
+        for handle in result:
+            FlatLayer.track_shared_memory(handle)
+
+async def fetch_tiles(engine: FetchEngine, provider: TileProvider, url: str, tiles, output: TileOutput, pool = None, failures: FailureLog = None) -> None:
+    """Fetch and decode (zoom, x, y) tiles with up to engine.concurrency requests in flight.
+    Decoding and writing run in worker threads so that the event loop keeps fetching, or in the process pool if one is given.
+    A tile that fails is recorded in failures and the run goes on with the next one."""
+    loop = asyncio.get_running_loop()
+    tiles = list(tiles)
+    output.plan(tiles)
+    pending_tiles = iter(tiles)
+    if(failures is None):
+        failures = FailureLog()
+
+    async def fetch_loop():
+        # All fetchers share one iterator, so every tile is fetched exactly once, in planned order.
+        for zoom, x, y in pending_tiles:
+            print(f"Fetching tile {zoom}-{x}-{y}")
+            try:
+                with stage(output.stats, "fetch"):
+                    body = await engine.fetch(provider, provider.tile_url(url, zoom, x, y))
+            except Exception as e:
+                failures.record_failure((zoom, x, y), "fetch", e)
+                output.skip_tile((zoom, x, y))
+                continue
+            try:
+                if(pool is None):
+                    problems = await loop.run_in_executor(None, output.decode_and_write, zoom, x, y, body)
+                else:
+                    future = pool.submit(decode_in_process, output.options(), output.stats is not None, zoom, x, y, body)
+                    future.add_done_callback(track_worker_result)
+                    result, events, problems = await asyncio.wrap_future(future)
+                    if(events is not None):
+                        output.stats.replay(events)
+                    if(result is not None):
+                        await loop.run_in_executor(None, output.add_worker_result, zoom, x, y, result)
+            except Exception as e:
+                failures.record_failure((zoom, x, y), error_stage(e), e)
+                output.skip_tile((zoom, x, y))
+                continue
+            failures.record_recovered((zoom, x, y), problems)
+
+    await asyncio.gather(*[fetch_loop() for _ in range(engine.concurrency)])
+    if(output.stats is not None):
+        output.stats.count("tiles_failed", failures.failed)
+
+async def run(provider: TileProvider, url: str, tiles, output: TileOutput, concurrency: int = 8, rate_limit: float = None, processes: int = 0, failures: FailureLog = None) -> None:
+    rate_limits = {provider.name: rate_limit} if rate_limit is not None else None
+    pool = None
+    if(processes > 0):
+        from concurrent.futures import ProcessPoolExecutor
+        pool = ProcessPoolExecutor(max_workers=processes)
+    try:
+        async with FetchEngine(concurrency=concurrency, rate_limits=rate_limits) as engine:
+            await fetch_tiles(engine, provider, url, tiles, output, pool, failures)
+    finally:
+        if(pool is not None):
+            pool.shutdown(wait=True)
+    output.close()
+
+def sanitize_name(name: str) -> str:
+    "Make a tile set name usable as part of a filename."
+    return re.sub("[^A-Za-z0-9_.-]+", "_", name)
+
+def main_for(provider: TileProvider, description: str):
+    "Command line entrypoint shared by all tile providers."
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--url", dest = "url", help="URL template of tiles to fetch. {x}, {y} and {z} in the template will be replaced.", required=True)
+    parser.add_argument("--start-x", dest = "start_x", help="X coordinate of first tile", required=False, type=int)
+    parser.add_argument("--start-y", dest = "start_y", help="Y coordinate of first tile", required=False, type=int)
+    parser.add_argument("--end-x", dest = "end_x", help="X coordinate of last tile (inclusive)", required=False, type=int)
+    parser.add_argument("--end-y", dest = "end_y", help="Y coordinate of last tile (inclusive)", required=False, type=int)
+    parser.add_argument("--bbox", dest = "bbox", help="Fetch all tiles intersecting the bounding box min_lon,min_lat,max_lon,max_lat", required=False)
+    parser.add_argument("--polygon", dest = "polygon", help="Fetch all tiles intersecting the polygons of a GeoJSON file", required=False)
+    parser.add_argument("--retry-failed", dest = "retry_failed", help="Fetch only the tiles recorded as failed in a failure log of an earlier run.", required=False)
+    parser.add_argument("--zoom", dest = "zoom", help="Zoom level to fetch with --bbox or --polygon. May be repeated, the URL must then contain {z}.", action="append", type=int, required=False)
+    parser.add_argument("--order", dest = "order", help="Order in which tiles are fetched.", choices=CURVES, default="hilbert")
+    parser.add_argument("--concurrency", dest = "concurrency", help="Number of tiles fetched at the same time.", default=8, type=int)
+    parser.add_argument("--processes", dest = "processes", help="Decode in this many worker processes instead of threads. 0 decodes in threads.", default=0, type=int)
+    parser.add_argument("--rate-limit", dest = "rate_limit", help="Maximum number of requests per second. 0 disables the limit." + (f" Defaults to {provider.rate_limit}." if provider.rate_limit is not None else ""), type=float, required=False)
+    if(provider.auth_param is not None):
+        parser.add_argument("--access-token", dest = "access_token", help=f"Access token added to the URL as `{provider.auth_param}` if it does not carry one." + (f" Defaults to ${provider.auth_env}." if provider.auth_env is not None else ""), required=False)
+    parser.add_argument("--name", dest = "name", help="Tile set name used in output filenames. Defaults to the name found in the URL.", required=False)
+
+    parser.add_argument("--json-indent", dest="json_indent", help="JSON file indentation. 0 or negative numbers generate dense JSON file.", default=0, type=int, required = False)
+    parser.add_argument("--output-dir", dest = "output_dir", help="Output directory", required=False)
+    parser.add_argument("--split-layers", dest = "split_layers", help="Split layers into separate GeoJSON files. Outputs Pure GeoJSON.", action="store_true", default=False)
+    parser.add_argument("--output", dest = "output", help="Output file", required=False)
+    parser.add_argument("--format", dest = "format", help="Output format. fgb and parquet always write one file per layer.", choices=OUTPUT_FORMATS, default="json")
+    parser.add_argument("--merge", dest = "merge", help="Merge each layer across the whole tile range into a single file.", action="store_true", default=False)
+    parser.add_argument("--stats", dest = "stats", help="Print per-stage timings and counters, or write them as JSON to the given file.", nargs="?", const="-", required=False)
+    parser.add_argument("--strict", dest = "strict", help="Fail a tile at its first malformed geometry, tag or layer, instead of skipping the malformed part.", action="store_true", default=False)
+    parser.add_argument("--failure-log", dest = "failure_log", help="Write a JSON line for every tile that failed or had malformed parts skipped. May be the file given to --retry-failed.", required=False)
+    parser.add_argument("--aggregate", dest = "aggregate", help="Write feature counts, point counts, line lengths and polygon areas per layer instead of the features, as one JSON file with every tile and the total.", action="store_true", default=False)
+    parser.add_argument("--group-by", dest = "group_by", help="With --aggregate, also aggregate per value of this property. May be repeated to group by several properties.", action="append", required=False)
+
+    args = parser.parse_args()
+
+    if(sys.platform.lower().startswith("win")):
+        try:
+            asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+        except:
+            pass
+
+    if(args.output_dir is None and args.output is None):
+        print("Must specify either --output or --output-dir")
+        exit(1)
+
+    if(args.output_dir is not None):
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    url = provider.authenticate(args.url, getattr(args, "access_token", None))
+    aggregate = (args.group_by or []) if args.aggregate else None
+
+    is_range = not (args.start_x is None or args.start_y is None or args.end_x is None or args.end_y is None)
+    if(not is_range and args.bbox is None and args.polygon is None and args.retry_failed is None):
+        match = provider.match_fixed(url)
+        if(match is None):
+            print(f"URL does not match {provider.description}.")
+            exit(1)
+        tile_name, zoom, xtile, ytile = match
+        stats = DecodeStats() if args.stats is not None else None
+        output = TileOutput(sanitize_name(args.name or tile_name), args.output_dir, args.output, args.json_indent, args.split_layers, args.format, stats=stats, strict=args.strict, aggregate=aggregate)
+        with FailureLog(args.failure_log) as failures:
+            # A fixed URL is fetched as is, the tile coordinates only tell the decoder where the tile is.
+            asyncio.run(run(provider, url, [(zoom, xtile, ytile)], output, 1, args.rate_limit, failures=failures))
+        if(stats is not None):
+            stats.report(args.stats)
+        exit(1 if failures.failed > 0 else 0)
+
+    match = provider.match_template(url)
+    if(match is None):
+        print(f"URL does not match {provider.description}.")
+        exit(1)
+    tile_name, url_zoom = match
+
+    if(args.output_dir is None):
+        print("Must specify --output-dir when fetching multiple tiles")
+        exit(1)
+
+    if(args.retry_failed is not None):
+        # Read before the failure log is opened, which may be the same file.
+        tiles = load_failed_tiles(args.retry_failed)
+        if(url_zoom is not None and any(zoom != url_zoom for zoom, _, _ in tiles)):
+            print("The failure log has tiles at other zoom levels than the URL.")
+            exit(1)
+        print(f"Retrying {len(tiles)} failed tiles")
+    elif(args.bbox is not None or args.polygon is not None):
+        if(url_zoom is None):
+            if(args.zoom is None):
+                print("--zoom is required when the URL contains {z}.")
+                exit(1)
+            zooms = args.zoom
+        else:
+            zooms = args.zoom if args.zoom is not None else [url_zoom]
+            if(any(zoom != url_zoom for zoom in zooms)):
+                print("The URL has a fixed zoom level. Use {z} in the URL to fetch other zoom levels.")
+                exit(1)
+
+        polygons = load_polygons(args.polygon) if args.polygon is not None else None
+        try:
+            bbox = parse_bbox(args.bbox) if args.bbox is not None else None
+        except ValueError as e:
+            print(e)
+            exit(1)
+        tiles = plan_tiles(zooms, bbox=bbox, polygons=polygons, curve=args.order)
+        print(f"Planned {len(tiles)} tiles at zoom levels {', '.join(str(zoom) for zoom in sorted(set(zooms)))}")
+    elif(url_zoom is None):
+        print("A tile range needs a fixed zoom level in the URL. Use --bbox or --polygon with --zoom for {z} templates.")
+        exit(1)
+    elif(args.start_x > args.end_x):
+        print("Start X coordinate must be smaller than end X coordinate.")
+        exit(1)
+    elif(args.start_y > args.end_y):
+        print("Start Y coordinate must be smaller than end Y coordinate.")
+        exit(1)
+    else:
+        tiles = plan_range(url_zoom, args.start_x, args.start_y, args.end_x, args.end_y, args.order)
+
+    stats = DecodeStats() if args.stats is not None else None
+    output = TileOutput(sanitize_name(args.name or tile_name), args.output_dir, None, args.json_indent, args.split_layers, args.format, args.merge, stats, args.strict, aggregate)
+    with FailureLog(args.failure_log) as failures:
+        asyncio.run(run(provider, url, tiles, output, args.concurrency, args.rate_limit, args.processes, failures))
+    if(stats is not None):
+        stats.report(args.stats)
+    if(failures.failed + failures.recovered > 0):
+        print(failures.summary())
+    if(failures.failed > 0):
+        exit(1)
@@ -1,12 +1,133 @@
 import argparse
 from .decoder.FileDecoder import FileDecoder
-import geojson
+from .decoder.DecodeStats import DecodeStats, stage
+from .writer.utils import OUTPUT_FORMATS, FORMAT_EXTENSIONS, layer_filename, write_layer
+import copy
 import json
+import os
 import sys
+from typing import Dict, Tuple, List
+
+def write_output(layers, args, stats: DecodeStats = None) -> List[str]:
+    "Write (layer name, FeatureCollection) pairs according to the output options. Returns the written filenames."
+    indent = args.json_indent if args.json_indent > 0 else None
+    outputs = []
+    if(args.layer is not None):
+        found = False
+        for layer_name, layer_content in layers:
+            found = True
+            with stage(stats, "write", layer_name):
+                if(args.format != "json"):
+                    write_layer(args.output_file, args.format, layer_name, layer_content)
+                else:
+                    json.dump(layer_content, open(args.output_file, 'w'), indent=indent)
+            outputs.append(args.output_file)
+            print("Writing layer {} to {}".format(layer_name, args.output_file))
+        if(not found):
+            print("Layer %s not found in input file." % (args.layer))
+    elif(args.split_layers or args.format != "json"):
+        for layer_name, layer_content in layers:
+            output_filename = layer_filename(args.output_file, layer_name, args.format)
+            print("Writing layer {} to file {}".format(layer_name, output_filename))
+            with stage(stats, "write", layer_name):
+                if(args.format != "json"):
+                    write_layer(output_filename, args.format, layer_name, layer_content)
+                else:
+                    json.dump(layer_content, open(output_filename, 'w'), indent=indent)
+            outputs.append(output_filename)
+    else:
+        with stage(stats, "write"):
+            json.dump(dict(layers), open(args.output_file, 'w'), indent=indent)
+        outputs.append(args.output_file)
+        print("Wrote JSON to file {}".format(args.output_file))
+    return outputs
+
+def decode_file(input_file: str, xtile: int, ytile: int, zoom: int, args, stats: DecodeStats = None) -> Tuple[List[str], Dict[str, int]]:
+    """Decode one tile and write it according to the output options. Returns the written filenames and the counts of malformed parts skipped.
+    Raises MalformedTileError with --strict, or if no layer of the tile can be read."""
+    decoder = FileDecoder(xtile, ytile, zoom, input_file, stats=stats, strict=args.strict)
+    if(args.layer is not None or args.split_layers or args.format != "json"):
+        # Layers are written one by one, so only the layer being written is kept in memory.
+        layers = decoder.iter_layers([args.layer] if args.layer is not None else None)
+    else:
+        layers = decoder.decode().items()
+    return write_output(layers, args, stats), decoder.problems
+
+def aggregate_file(input_file: str, xtile: int, ytile: int, zoom: int, args, stats: DecodeStats = None):
+    """Aggregate one tile according to --group-by and --layer. Returns the TileAggregate and the counts of malformed parts skipped.
+    Raises MalformedTileError with --strict, or if no layer of the tile can be read."""
+    decoder = FileDecoder(xtile, ytile, zoom, input_file, stats=stats, strict=args.strict)
+    aggregate = decoder.aggregate(args.group_by, [args.layer] if args.layer is not None else None)
+    return aggregate, decoder.problems
+
+def aggregate_tree(args, failures, stats: DecodeStats = None) -> None:
+    """Aggregate every {z}/{x}/{y} tile below the input directory into one JSON file with a summary per tile and the total.
+    The manifest is not used, since the total needs every tile."""
+    from .manifest import iter_tile_files
+    from .decoder.TileAggregate import RangeAggregate
+    from .failures import error_stage
+    aggregates = RangeAggregate(args.group_by)
+    for zoom, xtile, ytile, input_file in iter_tile_files(args.input_dir):
+        try:
+            aggregate, problems = aggregate_file(input_file, xtile, ytile, zoom, args, stats)
+        except Exception as e:
+            failures.record_failure((zoom, xtile, ytile), error_stage(e, input_file), e, input_file)
+            continue
+        failures.record_recovered((zoom, xtile, ytile), problems, input_file)
+        aggregates.add((zoom, xtile, ytile), aggregate)
+    with stage(stats, "write"):
+        json.dump(aggregates.summary(), open(args.output_file, 'w'), indent=args.json_indent if args.json_indent > 0 else None)
+    if(stats is not None):
+        stats.count("tiles_failed", failures.failed)
+    print("Aggregated {} tiles into {}".format(len(aggregates.tiles), args.output_file))
+
+def format_problems(problems: Dict[str, int]) -> str:
+    return ", ".join("{} ({})".format(problem, count) for problem, count in sorted(problems.items()))
+
+def decode_tree(args, failures, stats: DecodeStats = None) -> None:
+    """Decode every {z}/{x}/{y} tile below the input directory into the same layout below the output directory, skipping tiles recorded as unchanged in the manifest.
+    A tile that fails is recorded in the FailureLog and left out of the manifest, so the next run tries it again."""
+    from .manifest import Manifest, MANIFEST_FILENAME, iter_tile_files, options_key, file_snapshot
+    from .failures import error_stage
+    manifest_file = args.manifest if args.manifest is not None else os.path.join(args.output_file, MANIFEST_FILENAME)
+    options = options_key({
+        "format": args.format, "layer": args.layer, "split_layers": args.split_layers, "json_indent": args.json_indent, "strict": args.strict,
+    })
+    os.makedirs(args.output_file, exist_ok=True)
+    decoded = skipped = 0
+    with Manifest(manifest_file) as manifest:
+        for zoom, xtile, ytile, input_file in iter_tile_files(args.input_dir):
+            # The manifest reads the input file too, so an unreadable input fails only its tile.
+            try:
+                if(not args.force and manifest.is_current(input_file, options)):
+                    skipped += 1
+                    continue
+                tile_dir = os.path.join(args.output_file, str(zoom), str(xtile))
+                os.makedirs(tile_dir, exist_ok=True)
+                tile_args = copy.copy(args)
+                tile_args.output_file = os.path.join(tile_dir, str(ytile) + FORMAT_EXTENSIONS[args.format])
+                snapshot = file_snapshot(input_file)
+                outputs, problems = decode_file(input_file, xtile, ytile, zoom, tile_args, stats)
+                manifest.record(input_file, options, outputs, snapshot)
+            except Exception as e:
+                failures.record_failure((zoom, xtile, ytile), error_stage(e, input_file), e, input_file)
+                continue
+            failures.record_recovered((zoom, xtile, ytile), problems, input_file)
+            decoded += 1
+    if(stats is not None):
+        stats.count("tiles_skipped", skipped)
+        stats.count("tiles_failed", failures.failed)
+    print("Decoded {} tiles, skipped {} unchanged tiles.".format(decoded, skipped))
 
 def main():
-    parser = argparse.ArgumentParser(description="Convert Vector Tile Protobuf files to GeoJSON, and saves it to a *.json file.")
-    parser.add_argument("-i", "--input", required=True, dest='input_file', help="Input file")
+    if(len(sys.argv) > 1 and sys.argv[1] == "serve"):
+        from .server import main as serve
+        serve(sys.argv[2:])
+        return
+    parser = argparse.ArgumentParser(description="Convert Vector Tile Protobuf files to GeoJSON, and saves it to a *.json file. Run `vtdecode serve` to start a decode server instead.")
+    inputs = parser.add_mutually_exclusive_group(required=True)
+    inputs.add_argument("-i", "--input", dest='input_file', help="Input file")
+    inputs.add_argument("--input-dir", dest='input_dir', help="Decode every {z}/{x}/{y}.pbf tile below this directory. The output is then a directory with the same layout.")
     parser.add_argument("-o", "--output", required=True, dest='output_file',help="Output file")
 
     parser.add_argument("-x", dest = "tile_x", help="X coordinate of tile", required=False, type=int)
@@ -15,34 +136,54 @@ def main():
     parser.add_argument("--json-indent", dest="json_indent", help="JSON file indentation. 0 or negative numbers generate dense JSON file.", default=0, type=int)
     parser.add_argument("--layer", dest = "layer", help="Only decode layer with given name. Outputs Pure GeoJSON.", required=False)
     parser.add_argument("--split-layers", dest = "split_layers", help="Split layers into separate GeoJSON files. Outputs Pure GeoJSON.", action="store_true", default=False)
+    parser.add_argument("--format", dest = "format", help="Output format. fgb and parquet always write one file per layer.", choices=OUTPUT_FORMATS, default="json")
+    parser.add_argument("--stats", dest = "stats", help="Print per-stage timings and counters, or write them as JSON to the given file.", nargs="?", const="-", required=False)
+    parser.add_argument("--manifest", dest = "manifest", help="Manifest of decoded tiles for --input-dir. Defaults to .vtdecode-manifest.sqlite in the output directory.", required=False)
+    parser.add_argument("--force", dest = "force", help="Decode all tiles of --input-dir, even if the manifest records them as unchanged.", action="store_true", default=False)
+    parser.add_argument("--strict", dest = "strict", help="Fail a tile at its first malformed geometry, tag or layer, instead of skipping the malformed part.", action="store_true", default=False)
+    parser.add_argument("--failure-log", dest = "failure_log", help="Write a JSON line for every tile of --input-dir that failed or had malformed parts skipped.", required=False)
+    parser.add_argument("--aggregate", dest = "aggregate", help="Write feature counts, point counts, line lengths and polygon areas per layer as JSON instead of the features. With --input-dir the output is one file with every tile and the total.", action="store_true", default=False)
+    parser.add_argument("--group-by", dest = "group_by", help="With --aggregate, also aggregate per value of this property. May be repeated to group by several properties.", action="append", required=False)
     args = parser.parse_args()
 
-    if(not (args.tile_x is not None and args.tile_y is not None and args.tile_z is not None)):
+    if(args.input_dir is not None):
+        from .failures import FailureLog
+        stats = DecodeStats() if args.stats is not None else None
+        with FailureLog(args.failure_log) as failures:
+            if(args.aggregate):
+                aggregate_tree(args, failures, stats)
+            else:
+                decode_tree(args, failures, stats)
+            if(stats is not None):
+                stats.report(args.stats)
+            if(failures.failed + failures.recovered > 0):
+                print(failures.summary())
+        if(failures.failed > 0):
+            exit(1)
+    elif(not (args.tile_x is not None and args.tile_y is not None and args.tile_z is not None)):
         print("Please provide tile coordinates.")
         exit(1)
     elif(args.output_file is None):
         print("No output file specified.")
     else:
-        decoder = FileDecoder(args.tile_x, args.tile_y, args.tile_z, args.input_file)
-        decoded = decoder.decode()
-        if(args.layer is not None):
-            if(args.layer in decoded):
-                geojson.dump(decoded[args.layer], open(args.output_file, 'w'), indent=args.json_indent if args.json_indent > 0 else None)
-                print("Writing layer {} to {}".format(args.layer, args.output_file))
-            else:
-                print("Layer %s not found in input file." % (args.layer))
-        elif(args.split_layers):
-            if(args.output_file.endswith(".json")):
-                output_file_basename = args.output_file[:-5]
+        from .decoder.MalformedTileError import MalformedTileError
+        stats = DecodeStats() if args.stats is not None else None
+        try:
+            if(args.aggregate):
+                aggregate, problems = aggregate_file(args.input_file, args.tile_x, args.tile_y, args.tile_z, args, stats)
+                with stage(stats, "write"):
+                    json.dump({"tile": "{}/{}/{}".format(args.tile_z, args.tile_x, args.tile_y), "layers": aggregate.summary()},
+                              open(args.output_file, 'w'), indent=args.json_indent if args.json_indent > 0 else None)
+                print("Wrote aggregate to file {}".format(args.output_file))
             else:
-                output_file_basename = args.output_file
-            
-            for layer_name, layer_content in decoded.items():
-                print("Writing layer {} to file {}.json".format(layer_name, output_file_basename + "-" + layer_name))
-                json.dump(layer_content, open(output_file_basename + "-" + layer_name + ".json", 'w'), indent=args.json_indent if args.json_indent > 0 else None)
-        else:
-            json.dump(decoded, open(args.output_file, 'w'), indent=args.json_indent if args.json_indent > 0 else None)
-            print("Wrote JSON to file {}".format(args.output_file))
+                _, problems = decode_file(args.input_file, args.tile_x, args.tile_y, args.tile_z, args, stats)
+        except MalformedTileError as e:
+            print("Malformed tile: {}".format(e))
+            exit(1)
+        if(len(problems) > 0):
+            print("Skipped malformed parts of the tile: {}".format(format_problems(problems)))
+        if(stats is not None):
+            stats.report(args.stats)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,110 @@
+import hashlib
+import json
+import os
+import sqlite3
+from typing import Dict, Tuple, List, Iterator
+
+MANIFEST_FILENAME = ".vtdecode-manifest.sqlite"
+# Bump when the decoder output changes, so every tile is decoded again.
+MANIFEST_VERSION = 1
+COMMIT_INTERVAL = 1000
+
+def file_digest(filename: str) -> bytes:
+    "BLAKE2b digest of a file's content."
+    digest = hashlib.blake2b(digest_size=16)
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.digest()
+
+def file_snapshot(filename: str) -> Tuple[int, int, bytes]:
+    """Size, modification time and digest of a file, in this order. Taken before a tile is decoded, a file replaced
+    in the meantime no longer matches what is recorded, instead of its new content being recorded with the old outputs."""
+    stat = os.stat(filename)
+    return (stat.st_size, stat.st_mtime_ns, file_digest(filename))
+
+def options_key(options: Dict) -> str:
+    "Canonical string of the decoding options a tile's outputs depend on."
+    return json.dumps(dict(options, manifest_version=MANIFEST_VERSION), sort_keys=True, separators=(",", ":"))
+
+def iter_tile_files(root: str) -> Iterator[Tuple[int, int, int, str]]:
+    "Yield (zoom, x, y, path) for every {z}/{x}/{y}.* file below root, in tile order. Other files are ignored."
+    def numbered(path, files):
+        entries = []
+        with os.scandir(path) as it:
+            for entry in it:
+                name = entry.name.split(".", 1)[0] if files else entry.name
+                if(name.isdigit() and (entry.is_file() if files else entry.is_dir())):
+                    entries.append((int(name), entry.path))
+        return sorted(entries)
+
+    for zoom, zoom_path in numbered(root, False):
+        for xtile, x_path in numbered(zoom_path, False):
+            for ytile, y_path in numbered(x_path, True):
+                yield (zoom, xtile, ytile, y_path)
+
+class Manifest:
+    def __init__(self, filename: str):
+        """Record of decoded input tiles: size, modification time and content hash of each input, the options it was decoded with and the files it produced.
+        A tile whose size and modification time are unchanged is not hashed again, so checking a large tree costs one stat per file."""
+        self.filename = filename
+        self.connection = sqlite3.connect(filename)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS tiles ("
+            "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, digest BLOB, options TEXT, outputs TEXT"
+            ") WITHOUT ROWID"
+        )
+        self.pending = 0
+
+    def lookup(self, path: str):
+        return self.connection.execute(
+            "SELECT size, mtime_ns, digest, options, outputs FROM tiles WHERE path = ?", (path,)
+        ).fetchone()
+
+    def is_current(self, path: str, options: str) -> bool:
+        "True if the tile was decoded with the same options, its content has not changed and all its outputs still exist."
+        row = self.lookup(path)
+        if(row is None):
+            return False
+        size, mtime_ns, digest, recorded_options, outputs = row
+        if(recorded_options != options or not all(os.path.exists(output) for output in json.loads(outputs))):
+            return False
+        stat = os.stat(path)
+        if(stat.st_size == size and stat.st_mtime_ns == mtime_ns):
+            return True
+        if(stat.st_size != size or file_digest(path) != digest):
+            return False
+        # Touched but not modified: remember the new modification time to skip hashing next time.
+        self.connection.execute("UPDATE tiles SET mtime_ns = ? WHERE path = ?", (stat.st_mtime_ns, path))
+        self.changed()
+        return True
+
+    def record(self, path: str, options: str, outputs: List[str], snapshot: Tuple[int, int, bytes]) -> None:
+        "Record a decoded tile with the file_snapshot taken before it was decoded. Call after its outputs have been written."
+        size, mtime_ns, digest = snapshot
+        self.connection.execute(
+            "INSERT OR REPLACE INTO tiles (path, size, mtime_ns, digest, options, outputs) VALUES (?, ?, ?, ?, ?, ?)",
+            (path, size, mtime_ns, digest, options, json.dumps(outputs))
+        )
+        self.changed()
+
+    def changed(self) -> None:
+        self.pending += 1
+        if(self.pending >= COMMIT_INTERVAL):
+            self.commit()
+
+    def commit(self) -> None:
+        self.connection.commit()
+        self.pending = 0
+
+    def close(self) -> None:
+        self.commit()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,140 @@
+import json
+import math
+from typing import Dict, Tuple, List, Iterable
+from .decoder.utils import deg2frac, deg2num, hilbert_index, morton_index
+
+CURVES = ["hilbert", "zorder", "none"]
+
+def check_bbox(bbox: Tuple[float, float, float, float]) -> None:
+    "Raise ValueError for a bounding box outside of longitude and latitude ranges, or with min_lat > max_lat. min_lon > max_lon crosses the antimeridian."
+    min_lon, min_lat, max_lon, max_lat = bbox
+    if(not all(-180 <= lon <= 180 for lon in (min_lon, max_lon))):
+        raise ValueError("Bounding box longitudes must be between -180 and 180")
+    if(not all(-90 <= lat <= 90 for lat in (min_lat, max_lat))):
+        raise ValueError("Bounding box latitudes must be between -90 and 90")
+    if(min_lat > max_lat):
+        raise ValueError("Bounding box min_lat must not be greater than max_lat")
+
+def parse_bbox(text: str) -> Tuple[float, float, float, float]:
+    "Parse a 'min_lon,min_lat,max_lon,max_lat' string."
+    try:
+        values = [float(value) for value in text.split(",")]
+    except ValueError:
+        values = []
+    if(len(values) != 4):
+        raise ValueError("Bounding box must be given as min_lon,min_lat,max_lon,max_lat")
+    bbox = (values[0], values[1], values[2], values[3])
+    check_bbox(bbox)
+    return bbox
+
+def load_polygons(filename: str) -> List[List[List[Tuple[float, float]]]]:
+    "Read the polygons of a GeoJSON file (geometry, Feature or FeatureCollection) as lists of rings."
+    with open(filename, 'r') as f:
+        return extract_polygons(json.load(f))
+
+def extract_polygons(obj) -> List[List[List[Tuple[float, float]]]]:
+    geom_type = obj.get("type")
+    if(geom_type == "FeatureCollection"):
+        return [polygon for feature in obj["features"] for polygon in extract_polygons(feature)]
+    elif(geom_type == "Feature"):
+        return extract_polygons(obj["geometry"]) if obj.get("geometry") is not None else []
+    elif(geom_type == "GeometryCollection"):
+        return [polygon for geometry in obj["geometries"] for polygon in extract_polygons(geometry)]
+    elif(geom_type == "Polygon"):
+        return [obj["coordinates"]]
+    elif(geom_type == "MultiPolygon"):
+        return list(obj["coordinates"])
+    return []
+
+def tiles_for_bbox(bbox: Tuple[float, float, float, float], zoom: int) -> List[Tuple[int, int, int]]:
+    "All (zoom, x, y) tiles intersecting a lon/lat bounding box. A box with min_lon > max_lon crosses the antimeridian and is split there."
+    check_bbox(bbox)
+    min_lon, min_lat, max_lon, max_lat = bbox
+    if(min_lon > max_lon):
+        return tiles_for_bbox((min_lon, min_lat, 180.0, max_lat), zoom) + tiles_for_bbox((-180.0, min_lat, max_lon, max_lat), zoom)
+    min_x, min_y = deg2num(max_lat, min_lon, zoom)
+    max_x, max_y = deg2num(min_lat, max_lon, zoom)
+    return [(zoom, x, y) for x in range(min_x, max_x + 1) for y in range(min_y, max_y + 1)]
+
+def _segment_hits_tile(x0: float, y0: float, x1: float, y1: float, tx: int, ty: int) -> bool:
+    "Liang-Barsky test of a segment against the unit square of tile (tx, ty)."
+    t0 = 0.0
+    t1 = 1.0
+    dx = x1 - x0
+    dy = y1 - y0
+    for p, q in ((-dx, x0 - tx), (dx, tx + 1 - x0), (-dy, y0 - ty), (dy, ty + 1 - y0)):
+        if(p == 0):
+            if(q < 0):
+                return False
+        else:
+            r = q / p
+            if(p < 0):
+                if(r > t1):
+                    return False
+                t0 = max(t0, r)
+            else:
+                if(r < t0):
+                    return False
+                t1 = min(t1, r)
+    return True
+
+def tiles_for_polygons(polygons, zoom: int) -> List[Tuple[int, int, int]]:
+    """All (zoom, x, y) tiles intersecting the polygons. Edges are treated as straight lines in tile space.
+    Tiles crossed by an edge are found per edge, interior tiles by scanning each row of tiles of each polygon, so overlapping polygons are united."""
+    tiles = set()
+    for polygon in polygons:
+        edges = []
+        for ring in polygon:
+            points = [deg2frac(position[1], position[0], zoom) for position in ring]
+            if(len(points) > 0 and points[0] != points[-1]):
+                points.append(points[0])
+            edges.extend(zip(points[:-1], points[1:]))
+        _add_polygon_tiles(edges, 2 ** zoom, tiles)
+    return [(zoom, x, y) for x, y in tiles]
+
+def _add_polygon_tiles(edges, n: int, tiles) -> None:
+    "Add the (x, y) tiles crossed by or inside the edges of one polygon, its exterior and interior rings, to the set tiles."
+    for (x0, y0), (x1, y1) in edges:
+        for tx in range(max(int(math.floor(min(x0, x1))), 0), min(int(math.floor(max(x0, x1))), n - 1) + 1):
+            for ty in range(max(int(math.floor(min(y0, y1))), 0), min(int(math.floor(max(y0, y1))), n - 1) + 1):
+                if((tx, ty) not in tiles and _segment_hits_tile(x0, y0, x1, y1, tx, ty)):
+                    tiles.add((tx, ty))
+
+    if(len(edges) > 0):
+        min_y = max(int(math.floor(min(min(e[0][1], e[1][1]) for e in edges))), 0)
+        max_y = min(int(math.floor(max(max(e[0][1], e[1][1]) for e in edges))), n - 1)
+        for ty in range(min_y, max_y + 1):
+            row_center = ty + 0.5
+            crossings = []
+            for (x0, y0), (x1, y1) in edges:
+                if((y0 <= row_center) != (y1 <= row_center)):
+                    crossings.append(x0 + (row_center - y0) * (x1 - x0) / (y1 - y0))
+            crossings.sort()
+            for i in range(0, len(crossings) - 1, 2):
+                # Tiles whose center lies between an entering and a leaving crossing are inside.
+                start = max(int(math.ceil(crossings[i] - 0.5)), 0)
+                end = min(int(math.floor(crossings[i + 1] - 0.5)), n - 1)
+                for tx in range(start, end + 1):
+                    tiles.add((tx, ty))
+
+def order_tiles(tiles: Iterable[Tuple[int, int, int]], curve: str = "hilbert") -> List[Tuple[int, int, int]]:
+    "Order tiles by zoom level, then along a space filling curve so that neighbouring tiles are fetched together."
+    if(curve == "hilbert"):
+        return sorted(tiles, key=lambda t: (t[0], hilbert_index(t[0], t[1], t[2])))
+    elif(curve == "zorder"):
+        return sorted(tiles, key=lambda t: (t[0], morton_index(t[0], t[1], t[2])))
+    return sorted(tiles)
+
+def plan_tiles(zooms: List[int], bbox: Tuple[float, float, float, float] = None, polygons=None, curve: str = "hilbert") -> List[Tuple[int, int, int]]:
+    "Enumerate the (zoom, x, y) tiles covering a bounding box or polygons at each zoom level, in fetch order."
+    tiles = []
+    for zoom in sorted(set(zooms)):
+        if(polygons is not None):
+            tiles.extend(tiles_for_polygons(polygons, zoom))
+        elif(bbox is not None):
+            tiles.extend(tiles_for_bbox(bbox, zoom))
+    return order_tiles(tiles, curve)
+
+def plan_range(zoom: int, start_x: int, start_y: int, end_x: int, end_y: int, curve: str = "hilbert") -> List[Tuple[int, int, int]]:
+    "Tiles of an inclusive x/y range at one zoom level, in fetch order."
+    return order_tiles([(zoom, x, y) for x in range(start_x, end_x + 1) for y in range(start_y, end_y + 1)], curve)
@@ -0,0 +1,82 @@
+import os
+import re
+from typing import Dict, Tuple, List
+from urllib.parse import urlsplit, urlencode, parse_qsl, urlunsplit
+
+class TileProvider:
+    def __init__(self, name: str, description: str, template_pattern: str, fixed_pattern: str, auth_param: str = None, auth_env: str = None, rate_limit: float = None):
+        """Definition of a tile source.
+        template_pattern matches URL templates and captures the tile set name and the zoom level (digits or {z}),
+        fixed_pattern matches single tile URLs and captures the tile set name, zoom, x and y.
+        rate_limit is the default maximum number of requests per second, None for no limit."""
+        self.name = name
+        self.description = description
+        self.template_pattern = re.compile(template_pattern)
+        self.fixed_pattern = re.compile(fixed_pattern)
+        self.auth_param = auth_param
+        self.auth_env = auth_env
+        self.rate_limit = rate_limit
+
+    def match_template(self, url: str) -> Tuple[str, int]:
+        "Tile set name and zoom level of a URL template. Zoom is None if the template contains {z}, the whole result is None if the URL does not match."
+        match = re.match(self.template_pattern, url)
+        if(match is None):
+            return None
+        return (match[1], None if match[2] == "{z}" else int(match[2]))
+
+    def match_fixed(self, url: str) -> Tuple[str, int, int, int]:
+        "Tile set name, zoom, x and y of a single tile URL, or None if the URL does not match."
+        match = re.match(self.fixed_pattern, url)
+        if(match is None):
+            return None
+        return (match[1], int(match[2]), int(match[3]), int(match[4]))
+
+    def tile_url(self, template: str, zoom: int, xtile: int, ytile: int) -> str:
+        return template.replace('{z}', str(zoom)).replace('{x}', str(xtile)).replace('{y}', str(ytile))
+
+    def authenticate(self, url: str, token: str = None) -> str:
+        "Add the access token to a URL, unless it already carries one. Falls back to the provider's environment variable."
+        if(self.auth_param is None):
+            return url
+        if(token is None and self.auth_env is not None):
+            token = os.environ.get(self.auth_env)
+        if(token is None):
+            return url
+        parts = urlsplit(url)
+        query = parse_qsl(parts.query, keep_blank_values=True)
+        if(any(key == self.auth_param for key, _ in query)):
+            return url
+        query.append((self.auth_param, token))
+        # Keep {x}/{y}/{z} placeholders readable, they are substituted later.
+        return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query, safe="{}"), parts.fragment))
+
+MAPBOX = TileProvider(
+    name="mapbox",
+    description="Mapbox Vector Tiles API request pattern",
+    template_pattern="https://api.mapbox.com/v4/([^/]*)/(\\d+|{z})/{x}/{y}.*",
+    fixed_pattern="https://api.mapbox.com/v4/([^/]*)/(\\d+)/(\\d+)/(\\d+).*",
+    auth_param="access_token",
+    auth_env="MAPBOX_ACCESS_TOKEN",
+    # 100,000 tile requests per minute
+    rate_limit=1666,
+)
+
+MAPILLARY = TileProvider(
+    name="mapillary",
+    description="Mapillary tile request pattern",
+    template_pattern="https://tiles.mapillary.com/maps/vtp/([^/]*)/2/(\\d+|{z})/{x}/{y}.*",
+    fixed_pattern="https://tiles.mapillary.com/maps/vtp/([^/]*)/2/(\\d+)/(\\d+)/(\\d+).*",
+    auth_param="access_token",
+    auth_env="MAPILLARY_ACCESS_TOKEN",
+    # 50,000 tile requests per minute
+    rate_limit=833,
+)
+
+XYZ = TileProvider(
+    name="xyz",
+    description="XYZ tile server pattern (.../{z}/{x}/{y})",
+    template_pattern="(?:[a-zA-Z][a-zA-Z0-9+.-]*://)?([^/?#]+).*?/(\\d+|{z})/{x}/{y}.*",
+    fixed_pattern="(?:[a-zA-Z][a-zA-Z0-9+.-]*://)?([^/?#]+).*/(\\d+)/(\\d+)/(\\d+)(?:\\.[A-Za-z0-9]+)?(?:[?#].*)?$",
+)
+
+PROVIDERS = {provider.name: provider for provider in [MAPBOX, MAPILLARY, XYZ]}
@@ -0,0 +1,172 @@
+import argparse
+import asyncio
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Tuple, List
+from aiohttp import web
+from .decoder.BytesDecoder import BytesDecoder
+from .failures import failure_record
+
+RESPONSE_TYPES = {"geojson": "application/geo+json", "ndjson": "application/x-ndjson"}
+
+def decode_tile(zoom: int, xtile: int, ytile: int, data: bytes, layer_names: List[str] = None, fmt: str = "geojson", tile_key: bool = False, strict: bool = False) -> bytes:
+    """Decode one tile and serialize it in the worker, so only bytes travel back to the server process.
+    geojson returns a dict of layers, ndjson one feature per line with its layer name as a foreign member.
+    With tile_key the tile coordinates are added to the output, as needed by batch responses.
+    With strict a malformed tile raises MalformedTileError instead of being decoded partially."""
+    decoder = BytesDecoder(xtile, ytile, zoom, data, strict=strict)
+    # Layers are decoded serially: the pool already keeps every core busy.
+    layers = decoder.iter_layers(layer_names)
+    tile = "{}/{}/{}".format(zoom, xtile, ytile)
+    if(fmt == "ndjson"):
+        lines = []
+        for layer_name, layer_content in layers:
+            for feature in layer_content["features"]:
+                feature = dict(feature, layer=layer_name)
+                if(tile_key):
+                    feature["tile"] = tile
+                lines.append(json.dumps(feature))
+        return "".join(line + "\n" for line in lines).encode()
+    elif(tile_key):
+        return (json.dumps({"tile": tile, "layers": dict(layers)}) + "\n").encode()
+    return json.dumps(dict(layers)).encode()
+
+def warm_up() -> None:
+    """Runs once in every worker: decodes and serializes a one-point tile, so the decoder's modules are imported
+    and its code paths exercised before the first real request arrives."""
+    from .decoder import vector_tile_pb2 as vt_proto
+    tile = vt_proto.Tile()
+    layer = tile.layers.add()
+    layer.name = "warm_up"
+    layer.version = 2
+    layer.extent = 4096
+    layer.keys.append("name")
+    layer.values.add().string_value = "warm_up"
+    feature = layer.features.add()
+    feature.type = vt_proto.Tile.GeomType.POINT
+    feature.tags.extend([0, 0])
+    # MoveTo(2048, 2048), zigzag encoded.
+    feature.geometry.extend([9, 4096, 4096])
+    decode_tile(0, 0, 0, tile.SerializeToString())
+
+def parse_batch(body: bytes) -> List[Tuple[int, int, int, bytes]]:
+    """Split a batch request body into tiles. Each tile is a header line "z/x/y length" followed by length bytes of tile data.
+    Raises ValueError for malformed bodies."""
+    tiles = []
+    pos = 0
+    while(pos < len(body)):
+        end = body.find(b"\n", pos)
+        if(end == -1):
+            raise ValueError("Missing tile header at byte {}".format(pos))
+        header = body[pos:end].decode("ascii", "replace").split()
+        if(len(header) != 2):
+            raise ValueError("Malformed tile header '{}'".format(" ".join(header)))
+        coordinates = header[0].split("/")
+        if(len(coordinates) != 3 or not all(c.isdigit() for c in coordinates) or not header[1].isdigit()):
+            raise ValueError("Malformed tile header '{}'".format(" ".join(header)))
+        length = int(header[1])
+        pos = end + 1
+        if(pos + length > len(body)):
+            raise ValueError("Tile {} is truncated".format(header[0]))
+        zoom, xtile, ytile = [int(c) for c in coordinates]
+        tiles.append((zoom, xtile, ytile, body[pos:pos + length]))
+        pos += length
+    return tiles
+
+class DecodeServer:
+    def __init__(self, workers: int = None):
+        """HTTP front end of a pool of decoder processes. The pool is started once and reused by every request,
+        connections are kept alive between requests."""
+        self.workers = workers if workers is not None and workers > 0 else (os.cpu_count() or 1)
+        self.pool = None
+
+    async def start(self, app: web.Application) -> None:
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[loop.run_in_executor(self.pool, warm_up) for _ in range(self.workers)])
+
+    async def stop(self, app: web.Application) -> None:
+        self.pool.shutdown(wait=True)
+        self.pool = None
+
+    def response_format(self, request: web.Request) -> str:
+        fmt = request.query.get("format")
+        if(fmt is None):
+            fmt = "ndjson" if "application/x-ndjson" in request.headers.get("Accept", "") else "geojson"
+        if(fmt not in RESPONSE_TYPES):
+            raise web.HTTPBadRequest(text="Unknown format {}, use one of {}.\n".format(fmt, ", ".join(RESPONSE_TYPES)))
+        return fmt
+
+    def strict(self, request: web.Request) -> bool:
+        "?strict=1 fails malformed tiles instead of skipping their malformed parts."
+        return request.query.get("strict", "0") not in ("0", "false", "")
+
+    def decode(self, zoom: int, xtile: int, ytile: int, data: bytes, layer_names: List[str], fmt: str, tile_key: bool = False, strict: bool = False):
+        return asyncio.get_running_loop().run_in_executor(self.pool, decode_tile, zoom, xtile, ytile, data, layer_names, fmt, tile_key, strict)
+
+    async def handle_tile(self, request: web.Request) -> web.Response:
+        "POST /decode/{z}/{x}/{y} with a raw tile as body."
+        fmt = self.response_format(request)
+        layer_names = request.query.getall("layer", None)
+        data = await request.read()
+        zoom, xtile, ytile = [int(request.match_info[c]) for c in ("z", "x", "y")]
+        try:
+            result = await self.decode(zoom, xtile, ytile, data, layer_names, fmt, strict=self.strict(request))
+        except Exception as e:
+            raise web.HTTPUnprocessableEntity(text="Failed to decode tile {}/{}/{}: {}\n".format(zoom, xtile, ytile, e))
+        return web.Response(body=result, content_type=RESPONSE_TYPES[fmt])
+
+    async def handle_batch(self, request: web.Request) -> web.StreamResponse:
+        """POST /batch with several tiles, see parse_batch. Tiles are decoded in parallel and returned as NDJSON in request order,
+        each line carrying its tile coordinates. Tiles that fail to decode produce an error line instead, a failure log record."""
+        fmt = self.response_format(request)
+        layer_names = request.query.getall("layer", None)
+        try:
+            tiles = parse_batch(await request.read())
+        except ValueError as e:
+            raise web.HTTPBadRequest(text=str(e) + "\n")
+
+        strict = self.strict(request)
+        results = [self.decode(zoom, xtile, ytile, data, layer_names, fmt, True, strict) for zoom, xtile, ytile, data in tiles]
+        response = web.StreamResponse(headers={"Content-Type": RESPONSE_TYPES["ndjson"]})
+        await response.prepare(request)
+        try:
+            for (zoom, xtile, ytile, _), result in zip(tiles, results):
+                try:
+                    body = await result
+                except Exception as e:
+                    body = (json.dumps(failure_record((zoom, xtile, ytile), "decode", e)) + "\n").encode()
+                await response.write(body)
+        finally:
+            for result in results:
+                result.cancel()
+        await response.write_eof()
+        return response
+
+    def application(self, max_request_size: int) -> web.Application:
+        app = web.Application(client_max_size=max_request_size)
+        app.router.add_post("/decode/{z:\\d+}/{x:\\d+}/{y:\\d+}", self.handle_tile)
+        app.router.add_post("/batch", self.handle_batch)
+        app.on_startup.append(self.start)
+        app.on_cleanup.append(self.stop)
+        return app
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(prog="vtdecode serve", description="Decode Vector Tile Protobuf files to GeoJSON over HTTP, using a pool of warm decoder processes.")
+    parser.add_argument("--host", dest = "host", help="Address to listen on.", default="127.0.0.1")
+    parser.add_argument("--port", dest = "port", help="Port to listen on.", default=8080, type=int)
+    parser.add_argument("--socket", dest = "socket", help="Listen on this Unix socket instead of a TCP port.", required=False)
+    parser.add_argument("--workers", dest = "workers", help="Number of decoder processes. Defaults to the number of CPUs.", required=False, type=int)
+    parser.add_argument("--max-request-size", dest = "max_request_size", help="Maximum request body in MiB.", default=64, type=int)
+    parser.add_argument("--keepalive-timeout", dest = "keepalive_timeout", help="Seconds an idle connection is kept open.", default=75, type=float)
+    args = parser.parse_args(argv)
+
+    app = DecodeServer(args.workers).application(args.max_request_size * 1024 * 1024)
+    if(args.socket is not None):
+        web.run_app(app, path=args.socket, keepalive_timeout=args.keepalive_timeout)
+    else:
+        web.run_app(app, host=args.host, port=args.port, keepalive_timeout=args.keepalive_timeout)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,359 @@
+import json
+import math
+import struct
+import sys
+from array import array
+from typing import Dict, Tuple, List
+from ..decoder.utils import hilbert_index
+from .utils import feature_properties, geometry_bounds, merge_bounds
+
+try:
+    import flatbuffers
+except ImportError:
+    flatbuffers = None
+
+MAGIC_BYTES = b"fgb\x03fgb\x00"
+NODE_ITEM_LEN = 40
+
+# FlatGeobuf GeometryType enum
+GEOMETRY_TYPES = {
+    "Point": 1,
+    "LineString": 2,
+    "Polygon": 3,
+    "MultiPoint": 4,
+    "MultiLineString": 5,
+    "MultiPolygon": 6,
+}
+
+# FlatGeobuf ColumnType enum
+COLUMN_BOOL = 2
+COLUMN_LONG = 7
+COLUMN_ULONG = 8
+COLUMN_DOUBLE = 10
+COLUMN_STRING = 11
+COLUMN_JSON = 12
+
+def _value_type(value) -> int:
+    if(isinstance(value, bool)):
+        return COLUMN_BOOL
+    elif(isinstance(value, int)):
+        return COLUMN_LONG if value < 2 ** 63 else COLUMN_ULONG
+    elif(isinstance(value, float)):
+        return COLUMN_DOUBLE
+    elif(isinstance(value, str)):
+        return COLUMN_STRING
+    return COLUMN_JSON
+
+def _merge_column_type(current: int, value_type: int) -> int:
+    "Widen a column type so that it can hold both kinds of values."
+    if(current is None or current == value_type):
+        return value_type
+    numeric = (COLUMN_LONG, COLUMN_ULONG, COLUMN_DOUBLE)
+    if(current in numeric and value_type in numeric):
+        return COLUMN_DOUBLE
+    return COLUMN_STRING
+
+def _encode_value(column_type: int, value) -> bytes:
+    if(column_type == COLUMN_BOOL):
+        return struct.pack("<B", 1 if value else 0)
+    elif(column_type == COLUMN_LONG):
+        return struct.pack("<q", value)
+    elif(column_type == COLUMN_ULONG):
+        return struct.pack("<Q", value)
+    elif(column_type == COLUMN_DOUBLE):
+        return struct.pack("<d", value)
+    elif(column_type == COLUMN_JSON):
+        encoded = json.dumps(value).encode("utf-8")
+    else:
+        encoded = (value if isinstance(value, str) else json.dumps(value)).encode("utf-8")
+    return struct.pack("<I", len(encoded)) + encoded
+
+def _create_double_vector(builder, values: List[float]) -> int:
+    builder.StartVector(8, len(values), 8)
+    for value in reversed(values):
+        builder.PrependFloat64(value)
+    return builder.EndVector(len(values))
+
+def _create_uint_vector(builder, values: List[int]) -> int:
+    builder.StartVector(4, len(values), 4)
+    for value in reversed(values):
+        builder.PrependUint32(value)
+    return builder.EndVector(len(values))
+
+def _create_offset_vector(builder, offsets: List[int]) -> int:
+    builder.StartVector(4, len(offsets), 4)
+    for offset in reversed(offsets):
+        builder.PrependUOffsetTRelative(offset)
+    return builder.EndVector(len(offsets))
+
+def _create_packed_double_vector(builder, data: bytes) -> int:
+    "Like _create_double_vector, for doubles already packed in little-endian order."
+    builder.StartVector(8, len(data) // 8, 8)
+    builder.head = builder.head - len(data)
+    builder.Bytes[builder.head:builder.head + len(data)] = data
+    return builder.EndVector(len(data) // 8)
+
+def _flatten(parts: List[List]) -> Tuple[List[float], List[int]]:
+    "Flatten rings or lines into an xy array and the list of part end indices."
+    xy = []
+    ends = []
+    for part in parts:
+        for position in part:
+            xy.append(position[0])
+            xy.append(position[1])
+        ends.append(len(xy) // 2)
+    return xy, ends
+
+def _build_geometry(builder, geom_type: str, coordinates) -> int:
+    parts_offset = None
+    xy_offset = None
+    ends_offset = None
+
+    if(geom_type == "MultiPolygon"):
+        parts = [_build_geometry(builder, "Polygon", polygon) for polygon in coordinates]
+        parts_offset = _create_offset_vector(builder, parts)
+    else:
+        if(geom_type == "Point"):
+            xy, ends = [coordinates[0], coordinates[1]], []
+        elif(geom_type == "LineString" or geom_type == "MultiPoint"):
+            xy, ends = _flatten([coordinates])
+            ends = []
+        else:
+            xy, ends = _flatten(coordinates)
+            if(len(ends) <= 1):
+                ends = []
+        xy_offset = _create_double_vector(builder, xy)
+        if(len(ends) > 0):
+            ends_offset = _create_uint_vector(builder, ends)
+
+    builder.StartObject(8)
+    if(ends_offset is not None):
+        builder.PrependUOffsetTRelativeSlot(0, ends_offset, 0)
+    if(xy_offset is not None):
+        builder.PrependUOffsetTRelativeSlot(1, xy_offset, 0)
+    if(parts_offset is not None):
+        builder.PrependUOffsetTRelativeSlot(7, parts_offset, 0)
+    builder.PrependUint8Slot(6, GEOMETRY_TYPES[geom_type], 0)
+    return builder.EndObject()
+
+def _build_flat_geometry(builder, flat, i: int, part: int = None) -> int:
+    "_build_geometry for feature i of a FlatLayer. Coordinates are copied in ranges, not per vertex."
+    geom_type = flat.geometry_type(i)
+    parts = flat.parts(i)
+    parts_offset = None
+    xy_offset = None
+    ends_offset = None
+
+    if(geom_type == "MultiPolygon" and part is None):
+        polygons = [_build_flat_geometry(builder, flat, i, index) for index in range(len(parts))]
+        parts_offset = _create_offset_vector(builder, polygons)
+    else:
+        if(part is not None):
+            geom_type = "Polygon"
+        rings = parts[part if part is not None else 0]
+        first = rings[0][0]
+        data = flat.coordinate_bytes(first, rings[-1][1])
+        if(sys.byteorder != "little"):
+            swapped = array("d", data)
+            swapped.byteswap()
+            data = swapped.tobytes()
+        xy_offset = _create_packed_double_vector(builder, data)
+        if((geom_type == "Polygon" or geom_type == "MultiLineString") and len(rings) > 1):
+            ends_offset = _create_uint_vector(builder, [end - first for _, end in rings])
+
+    builder.StartObject(8)
+    if(ends_offset is not None):
+        builder.PrependUOffsetTRelativeSlot(0, ends_offset, 0)
+    if(xy_offset is not None):
+        builder.PrependUOffsetTRelativeSlot(1, xy_offset, 0)
+    if(parts_offset is not None):
+        builder.PrependUOffsetTRelativeSlot(7, parts_offset, 0)
+    builder.PrependUint8Slot(6, GEOMETRY_TYPES[geom_type], 0)
+    return builder.EndObject()
+
+class FlatGeobufWriter:
+    def __init__(self, filename: str, layer_name: str = None, index_node_size: int = 16):
+        "Collect features of one layer and write them as FlatGeobuf with a packed Hilbert R-tree index."
+        if(flatbuffers is None):
+            raise ImportError("Writing FlatGeobuf requires the flatbuffers package. Install it with `pip install vtdecode[flatgeobuf]`.")
+        self.filename = filename
+        self.layer_name = layer_name
+        self.index_node_size = max(index_node_size, 2)
+        self.features = []
+
+    def add_features(self, features) -> None:
+        for feature in features:
+            geometry = feature["geometry"]
+            if(geometry is None):
+                continue
+            self.features.append((geometry, feature_properties(feature), geometry_bounds(geometry)))
+
+    def add_flat_layer(self, flat) -> None:
+        "Add the features of a FlatLayer. Geometries stay in the flat buffers until they are encoded."
+        for i in range(len(flat)):
+            if(flat.types[i] == 0):
+                continue
+            self.features.append(((flat, i), flat.feature_properties(i), flat.feature_bounds(i)))
+
+    def _columns(self) -> Tuple[List[str], Dict[str, int]]:
+        names = []
+        types = dict()
+        for _, properties, _ in self.features:
+            for name, value in properties.items():
+                if(value is None):
+                    continue
+                if(name not in types):
+                    names.append(name)
+                    types[name] = None
+                types[name] = _merge_column_type(types[name], _value_type(value))
+        return names, types
+
+    def _header(self, names, types, envelope, geometry_type: int) -> bytes:
+        builder = flatbuffers.Builder(1024)
+        name_offset = builder.CreateString(self.layer_name) if self.layer_name is not None else None
+
+        column_offsets = []
+        for name in names:
+            column_name = builder.CreateString(name)
+            builder.StartObject(11)
+            builder.PrependUOffsetTRelativeSlot(0, column_name, 0)
+            builder.PrependUint8Slot(1, types[name], 0)
+            column_offsets.append(builder.EndObject())
+        columns_offset = _create_offset_vector(builder, column_offsets)
+
+        envelope_offset = _create_double_vector(builder, list(envelope)) if envelope is not None else None
+
+        crs_org = builder.CreateString("EPSG")
+        builder.StartObject(6)
+        builder.PrependUOffsetTRelativeSlot(0, crs_org, 0)
+        builder.PrependInt32Slot(1, 4326, 0)
+        crs_offset = builder.EndObject()
+
+        builder.StartObject(14)
+        if(name_offset is not None):
+            builder.PrependUOffsetTRelativeSlot(0, name_offset, 0)
+        if(envelope_offset is not None):
+            builder.PrependUOffsetTRelativeSlot(1, envelope_offset, 0)
+        builder.PrependUint8Slot(2, geometry_type, 0)
+        builder.PrependUOffsetTRelativeSlot(7, columns_offset, 0)
+        builder.PrependUint64Slot(8, len(self.features), 0)
+        builder.PrependUint16Slot(9, self.index_node_size if len(self.features) > 0 else 0, 16)
+        builder.PrependUOffsetTRelativeSlot(10, crs_offset, 0)
+        builder.FinishSizePrefixed(builder.EndObject())
+        return bytes(builder.Output())
+
+    def _feature(self, geometry, properties, column_index, types) -> bytes:
+        builder = flatbuffers.Builder(1024)
+        if(isinstance(geometry, tuple)):
+            geometry_offset = _build_flat_geometry(builder, *geometry)
+        else:
+            geometry_offset = _build_geometry(builder, geometry["type"], geometry["coordinates"])
+
+        encoded = bytearray()
+        for name, value in properties.items():
+            if(value is None):
+                continue
+            encoded += struct.pack("<H", column_index[name])
+            encoded += _encode_value(types[name], value)
+        properties_offset = builder.CreateByteVector(bytes(encoded)) if len(encoded) > 0 else None
+
+        builder.StartObject(3)
+        builder.PrependUOffsetTRelativeSlot(0, geometry_offset, 0)
+        if(properties_offset is not None):
+            builder.PrependUOffsetTRelativeSlot(1, properties_offset, 0)
+        builder.FinishSizePrefixed(builder.EndObject())
+        return bytes(builder.Output())
+
+    def _hilbert_sort(self, envelope) -> None:
+        "Sort features along a Hilbert curve over the layer extent, as required by the packed R-tree."
+        min_x, min_y, max_x, max_y = envelope
+        width = (max_x - min_x) or 1.0
+        height = (max_y - min_y) or 1.0
+        hilbert_max = (1 << 16) - 1
+
+        def sort_key(item):
+            bounds = item[2]
+            x = int(hilbert_max * ((bounds[0] + bounds[2]) / 2 - min_x) / width)
+            y = int(hilbert_max * ((bounds[1] + bounds[3]) / 2 - min_y) / height)
+            return hilbert_index(16, x, y)
+
+        self.features.sort(key=sort_key)
+
+    def _index(self, feature_offsets: List[int]) -> bytes:
+        "Build the packed Hilbert R-tree. Nodes are stored root first, leaves last."
+        num_items = len(feature_offsets)
+        node_size = self.index_node_size
+
+        level_num_nodes = [num_items]
+        n = num_items
+        while(True):
+            n = int(math.ceil(n / node_size))
+            level_num_nodes.append(n)
+            if(n == 1):
+                break
+        num_nodes = sum(level_num_nodes)
+
+        level_bounds = []
+        n = num_nodes
+        for size in level_num_nodes:
+            level_bounds.append((n - size, n))
+            n -= size
+
+        nodes = [None] * num_nodes
+        leaf_start = level_bounds[0][0]
+        for i, (_, _, bounds) in enumerate(self.features):
+            nodes[leaf_start + i] = (bounds[0], bounds[1], bounds[2], bounds[3], feature_offsets[i])
+
+        for level in range(len(level_bounds) - 1):
+            child_start, child_end = level_bounds[level]
+            parent = level_bounds[level + 1][0]
+            for first_child in range(child_start, child_end, node_size):
+                children = nodes[first_child:min(first_child + node_size, child_end)]
+                nodes[parent] = (
+                    min(child[0] for child in children),
+                    min(child[1] for child in children),
+                    max(child[2] for child in children),
+                    max(child[3] for child in children),
+                    first_child,
+                )
+                parent += 1
+
+        return b"".join(struct.pack("<ddddQ", *node) for node in nodes)
+
+    def close(self) -> None:
+        envelope = None
+        geometry_types = set()
+        for geometry, _, bounds in self.features:
+            envelope = merge_bounds(envelope, bounds)
+            geometry_types.add(geometry[0].geometry_type(geometry[1]) if isinstance(geometry, tuple) else geometry["type"])
+        geometry_type = GEOMETRY_TYPES[geometry_types.pop()] if len(geometry_types) == 1 else 0
+
+        names, types = self._columns()
+        column_index = {name: i for i, name in enumerate(names)}
+
+        if(envelope is not None):
+            self._hilbert_sort(envelope)
+
+        encoded_features = []
+        feature_offsets = []
+        offset = 0
+        for geometry, properties, _ in self.features:
+            encoded = self._feature(geometry, properties, column_index, types)
+            feature_offsets.append(offset)
+            encoded_features.append(encoded)
+            offset += len(encoded)
+
+        with open(self.filename, 'wb') as f:
+            f.write(MAGIC_BYTES)
+            f.write(self._header(names, types, envelope, geometry_type))
+            if(len(self.features) > 0):
+                f.write(self._index(feature_offsets))
+            for encoded in encoded_features:
+                f.write(encoded)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if(exc_type is None):
+            self.close()
@@ -0,0 +1,193 @@
+import json
+import os
+import struct
+import sys
+from array import array
+from .utils import WKB_TYPES, feature_properties
+from .GeoJSONWriter import feature_text
+from typing import Dict, Tuple, List
+
+GEOMETRY_NAMES = {code: name for name, code in WKB_TYPES.items()}
+# Native byte order flag of WKB, the coordinates are copied as they are stored in memory.
+WKB_BYTE_ORDER = 1 if sys.byteorder == "little" else 0
+
+# (attribute, array typecode or None for raw bytes)
+BUFFERS = [
+    ("types", "B"),
+    ("feature_offsets", "q"),
+    ("part_offsets", "q"),
+    ("ring_offsets", "q"),
+    ("coordinates", "d"),
+    ("bounds", "d"),
+    ("property_offsets", "q"),
+    ("properties", None),
+    ("text_offsets", "q"),
+    ("text", None),
+]
+
+def _polygons(geom_type: str, coordinates) -> List:
+    "Geometry coordinates as a list of polygons of rings, the common layout of every geometry type."
+    if(geom_type == "Point"):
+        return [[[coordinates]]]
+    elif(geom_type == "LineString" or geom_type == "MultiPoint"):
+        return [[coordinates]]
+    elif(geom_type == "Polygon" or geom_type == "MultiLineString"):
+        return [coordinates]
+    return coordinates
+
+class FlatLayer:
+    def __init__(self, name: str):
+        """A decoded layer stored in a few flat buffers instead of one Python object per vertex.
+        Feature i has geometry type types[i] (a WKB type code, 0 without geometry) and the parts feature_offsets[i] to feature_offsets[i + 1].
+        Parts (the polygons of a MultiPolygon, otherwise one per feature) index into rings through part_offsets,
+        rings (or lines, or the points of a MultiPoint) index into vertices through ring_offsets, and vertex v is
+        coordinates[2 * v], coordinates[2 * v + 1]. Properties are JSON, text optionally holds each feature serialized as GeoJSON."""
+        self.name = name
+        self.types = array("B")
+        self.feature_offsets = array("q", [0])
+        self.part_offsets = array("q", [0])
+        self.ring_offsets = array("q", [0])
+        self.coordinates = array("d")
+        self.bounds = array("d")
+        self.property_offsets = array("q", [0])
+        self.properties = b""
+        self.text_offsets = array("q", [0])
+        self.text = b""
+
+    def __len__(self) -> int:
+        return len(self.types)
+
+    @staticmethod
+    def from_features(name: str, features, text: bool = False, json_indent: int = 0) -> "FlatLayer":
+        "Flatten decoded GeoJSON features. With text, every feature is also serialized as GeoJSON, indented as inside a FeatureCollection."
+        flat = FlatLayer(name)
+        properties = []
+        texts = []
+        for feature in features:
+            geometry = feature["geometry"]
+            if(geometry is None):
+                flat.types.append(0)
+                flat.bounds.extend((0.0, 0.0, 0.0, 0.0))
+            else:
+                flat.types.append(WKB_TYPES[geometry["type"]])
+                xs = []
+                ys = []
+                for polygon in _polygons(geometry["type"], geometry["coordinates"]):
+                    for ring in polygon:
+                        for position in ring:
+                            xs.append(position[0])
+                            ys.append(position[1])
+                        flat.ring_offsets.append(len(xs) + len(flat.coordinates) // 2)
+                    flat.part_offsets.append(len(flat.ring_offsets) - 1)
+                flat.coordinates.extend(value for position in zip(xs, ys) for value in position)
+                flat.bounds.extend((min(xs), min(ys), max(xs), max(ys)) if len(xs) > 0 else (0.0, 0.0, 0.0, 0.0))
+            flat.feature_offsets.append(len(flat.part_offsets) - 1)
+
+            properties.append(json.dumps(feature_properties(feature)).encode("utf-8"))
+            flat.property_offsets.append(flat.property_offsets[-1] + len(properties[-1]))
+            if(text):
+                texts.append(feature_text(feature, json_indent if json_indent > 0 else None).encode("utf-8"))
+                flat.text_offsets.append(flat.text_offsets[-1] + len(texts[-1]))
+        flat.properties = b"".join(properties)
+        flat.text = b"".join(texts)
+        return flat
+
+    def to_shared_memory(self) -> Tuple[str, str, List]:
+        "Copy every buffer into one shared memory block. Returns a small picklable handle, the receiver must call from_shared_memory exactly once."
+        from multiprocessing.shared_memory import SharedMemory
+        views = [memoryview(getattr(self, attribute)).cast("B") for attribute, _ in BUFFERS]
+        block = SharedMemory(create=True, size=max(sum(len(view) for view in views), 1))
+        layout = []
+        offset = 0
+        for (attribute, typecode), view in zip(BUFFERS, views):
+            block.buf[offset:offset + len(view)] = view
+            layout.append((attribute, typecode, offset, len(view)))
+            offset += len(view)
+        block.close()
+        if(os.name == "posix"):
+            # The receiving process owns the block from now on and unlinks it, the tracker of this process must not.
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(block._name, "shared_memory")
+        return (block.name, self.name, layout)
+
+    @staticmethod
+    def track_shared_memory(handle: Tuple[str, str, List]) -> None:
+        "Register a received block with the resource tracker of this process, which unlinks it at exit unless from_shared_memory consumed it."
+        if(os.name == "posix"):
+            from multiprocessing import resource_tracker
+            resource_tracker.register("/" + handle[0].lstrip("/"), "shared_memory")
+
+    @staticmethod
+    def from_shared_memory(handle: Tuple[str, str, List]) -> "FlatLayer":
+        "Copy a layer out of the block created by to_shared_memory, one buffer at a time, and free the block."
+        from multiprocessing.shared_memory import SharedMemory
+        block_name, name, layout = handle
+        block = SharedMemory(name=block_name)
+        flat = FlatLayer(name)
+        try:
+            for attribute, typecode, offset, length in layout:
+                if(typecode is None):
+                    setattr(flat, attribute, bytes(block.buf[offset:offset + length]))
+                else:
+                    values = array(typecode)
+                    values.frombytes(block.buf[offset:offset + length])
+                    setattr(flat, attribute, values)
+        finally:
+            block.close()
+            block.unlink()
+        return flat
+
+    # Accessors used by the writers.
+    def geometry_type(self, i: int) -> str:
+        "GeoJSON geometry type of feature i, None without geometry."
+        return GEOMETRY_NAMES.get(self.types[i])
+
+    def feature_bounds(self, i: int) -> Tuple[float, float, float, float]:
+        return tuple(self.bounds[4 * i:4 * i + 4])
+
+    def feature_properties(self, i: int) -> Dict:
+        return json.loads(self.properties[self.property_offsets[i]:self.property_offsets[i + 1]])
+
+    def feature_text(self, i: int) -> str:
+        return self.text[self.text_offsets[i]:self.text_offsets[i + 1]].decode("utf-8")
+
+    def parts(self, i: int) -> List[List[Tuple[int, int]]]:
+        "Vertex ranges (start, end) of the rings of every part of feature i."
+        return [
+            [(self.ring_offsets[ring], self.ring_offsets[ring + 1]) for ring in range(self.part_offsets[part], self.part_offsets[part + 1])]
+            for part in range(self.feature_offsets[i], self.feature_offsets[i + 1])
+        ]
+
+    def coordinate_bytes(self, start: int, end: int) -> bytes:
+        "Raw native-order doubles of vertices start to end."
+        return memoryview(self.coordinates)[2 * start:2 * end].tobytes()
+
+    def wkb(self, i: int) -> bytes:
+        "Encode feature i as 2D WKB in native byte order, by copying coordinate ranges instead of packing every vertex."
+        geom_type = self.geometry_type(i)
+        parts = self.parts(i)
+
+        def header(code: int) -> bytes:
+            return struct.pack("=BI", WKB_BYTE_ORDER, code)
+
+        def positions(ring) -> bytes:
+            return struct.pack("=I", ring[1] - ring[0]) + self.coordinate_bytes(*ring)
+
+        def polygon(rings) -> bytes:
+            return header(WKB_TYPES["Polygon"]) + struct.pack("=I", len(rings)) + b"".join(positions(ring) for ring in rings)
+
+        if(geom_type == "Point"):
+            return header(WKB_TYPES["Point"]) + self.coordinate_bytes(*parts[0][0])
+        elif(geom_type == "LineString"):
+            return header(WKB_TYPES["LineString"]) + positions(parts[0][0])
+        elif(geom_type == "Polygon"):
+            return polygon(parts[0])
+        elif(geom_type == "MultiPoint"):
+            start, end = parts[0][0]
+            return header(WKB_TYPES["MultiPoint"]) + struct.pack("=I", end - start) + b"".join(
+                header(WKB_TYPES["Point"]) + self.coordinate_bytes(v, v + 1) for v in range(start, end))
+        elif(geom_type == "MultiLineString"):
+            return header(WKB_TYPES["MultiLineString"]) + struct.pack("=I", len(parts[0])) + b"".join(
+                header(WKB_TYPES["LineString"]) + positions(ring) for ring in parts[0])
+        else:
+            return header(WKB_TYPES["MultiPolygon"]) + struct.pack("=I", len(parts)) + b"".join(polygon(rings) for rings in parts)
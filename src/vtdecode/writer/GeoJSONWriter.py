@@ -0,0 +1,48 @@
+import geojson
+import json
+from geojson import FeatureCollection
+from typing import List
+
+def feature_text(feature, indent: int = None) -> str:
+    "Serialize a feature the way it appears inside a FeatureCollection written by json.dump."
+    text = json.dumps(feature, indent=indent)
+    return text if indent is None else text.replace("\n", "\n" + " " * (2 * indent))
+
+def feature_collection_text(features: List[str], indent: int = None) -> str:
+    "Assemble serialized features into the text json.dump writes for a FeatureCollection."
+    if(indent is None):
+        return '{"type": "FeatureCollection", "features": [' + ", ".join(features) + ']}'
+    pad = " " * indent
+    if(len(features) == 0):
+        return '{\n' + pad + '"type": "FeatureCollection",\n' + pad + '"features": []\n}'
+    return ('{\n' + pad + '"type": "FeatureCollection",\n' + pad + '"features": [\n' + pad * 2
+        + (",\n" + pad * 2).join(features) + "\n" + pad + "]\n}")
+
+class GeoJSONWriter:
+    def __init__(self, filename: str, json_indent: int = 0):
+        "Collect features of one layer and write them as a GeoJSON FeatureCollection."
+        self.filename = filename
+        self.json_indent = json_indent
+        self.features = []
+
+    def add_features(self, features) -> None:
+        self.features.extend(features)
+
+    def add_flat_layer(self, flat) -> None:
+        "Add the features of a FlatLayer created with text=True. Their GeoJSON text is written as it is."
+        self.features.extend(flat.feature_text(i) for i in range(len(flat)))
+
+    def close(self) -> None:
+        indent = self.json_indent if self.json_indent > 0 else None
+        with open(self.filename, 'w') as f:
+            if(not any(isinstance(feature, str) for feature in self.features)):
+                geojson.dump(FeatureCollection(self.features), f, indent=indent)
+            else:
+                f.write(feature_collection_text([feature if isinstance(feature, str) else feature_text(feature, indent) for feature in self.features], indent))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if(exc_type is None):
+            self.close()
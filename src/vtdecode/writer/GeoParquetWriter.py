@@ -0,0 +1,93 @@
+import json
+from .utils import feature_properties, geometry_bounds, merge_bounds, to_wkb
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+GEOPARQUET_VERSION = "1.0.0"
+
+class GeoParquetWriter:
+    def __init__(self, filename: str, compression: str = "snappy"):
+        "Collect features of one layer and write them as GeoParquet with a WKB geometry column."
+        if(pyarrow is None):
+            raise ImportError("Writing GeoParquet requires pyarrow. Install it with `pip install vtdecode[parquet]`.")
+        self.filename = filename
+        self.compression = compression
+        self.geometries = []
+        self.properties = []
+        self.geometry_types = set()
+        self.bounds = None
+
+    def add_features(self, features) -> None:
+        for feature in features:
+            geometry = feature["geometry"]
+            if(geometry is None):
+                continue
+            self.geometries.append(to_wkb(geometry))
+            self.properties.append(feature_properties(feature))
+            self.geometry_types.add(geometry["type"])
+            self.bounds = merge_bounds(self.bounds, geometry_bounds(geometry))
+
+    def add_flat_layer(self, flat) -> None:
+        "Add the features of a FlatLayer. WKB is assembled from coordinate ranges, without creating objects per vertex."
+        for i in range(len(flat)):
+            geom_type = flat.geometry_type(i)
+            if(geom_type is None):
+                continue
+            self.geometries.append(flat.wkb(i))
+            self.properties.append(flat.feature_properties(i))
+            self.geometry_types.add(geom_type)
+            self.bounds = merge_bounds(self.bounds, flat.feature_bounds(i))
+
+    def _column(self, name: str):
+        values = [properties.get(name) for properties in self.properties]
+        try:
+            return pyarrow.array(values)
+        except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError):
+            # Mixed value types within one attribute, fall back to strings.
+            return pyarrow.array([None if value is None else str(value) for value in values], type=pyarrow.string())
+
+    def close(self) -> None:
+        names = []
+        for properties in self.properties:
+            for name in properties:
+                if(name not in names):
+                    names.append(name)
+
+        columns = [self._column(name) for name in names]
+        column_names = list(names)
+        if("geometry" in names):
+            # The WKB column is named geometry, so a property of that name is kept under a prefixed name instead.
+            renamed = "_geometry"
+            while(renamed in names):
+                renamed = "_" + renamed
+            column_names[names.index("geometry")] = renamed
+            print("Property geometry of {} is written as column {}, geometry is the WKB geometry column.".format(self.filename, renamed))
+        columns.append(pyarrow.array(self.geometries, type=pyarrow.binary()))
+        table = pyarrow.Table.from_arrays(columns, names=column_names + ["geometry"])
+
+        geo_metadata = {
+            "version": GEOPARQUET_VERSION,
+            "primary_column": "geometry",
+            "columns": {
+                "geometry": {
+                    "encoding": "WKB",
+                    "geometry_types": sorted(self.geometry_types),
+                }
+            }
+        }
+        if(self.bounds is not None):
+            geo_metadata["columns"]["geometry"]["bbox"] = list(self.bounds)
+
+        table = table.replace_schema_metadata({b"geo": json.dumps(geo_metadata).encode("utf-8")})
+        pyarrow.parquet.write_table(table, self.filename, compression=self.compression)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if(exc_type is None):
+            self.close()
@@ -0,0 +1,107 @@
+import struct
+from typing import Dict, Tuple, List, Iterable
+
+OUTPUT_FORMATS = ["json", "fgb", "parquet"]
+FORMAT_EXTENSIONS = {"json": ".json", "fgb": ".fgb", "parquet": ".parquet"}
+
+WKB_TYPES = {
+    "Point": 1,
+    "LineString": 2,
+    "Polygon": 3,
+    "MultiPoint": 4,
+    "MultiLineString": 5,
+    "MultiPolygon": 6,
+}
+
+def feature_properties(feature) -> Dict:
+    "Properties of a decoded feature. The decoders attach them to the geometry, so both places are merged."
+    properties = dict()
+    geometry = feature.get("geometry")
+    if(geometry is not None and geometry.get("properties")):
+        properties.update(geometry["properties"])
+    if(feature.get("properties")):
+        properties.update(feature["properties"])
+    return properties
+
+def iter_positions(geometry) -> Iterable[Tuple[float, float]]:
+    "Iterate over every position of a GeoJSON geometry."
+    geom_type = geometry["type"]
+    coordinates = geometry["coordinates"]
+    if(geom_type == "Point"):
+        yield coordinates
+    elif(geom_type == "LineString" or geom_type == "MultiPoint"):
+        yield from coordinates
+    elif(geom_type == "Polygon" or geom_type == "MultiLineString"):
+        for ring in coordinates:
+            yield from ring
+    elif(geom_type == "MultiPolygon"):
+        for polygon in coordinates:
+            for ring in polygon:
+                yield from ring
+
+def geometry_bounds(geometry) -> Tuple[float, float, float, float]:
+    "Bounding box (min_x, min_y, max_x, max_y) of a GeoJSON geometry."
+    xs = []
+    ys = []
+    for position in iter_positions(geometry):
+        xs.append(position[0])
+        ys.append(position[1])
+    if(len(xs) == 0):
+        return (0.0, 0.0, 0.0, 0.0)
+    return (min(xs), min(ys), max(xs), max(ys))
+
+def merge_bounds(a, b) -> Tuple[float, float, float, float]:
+    if(a is None):
+        return b
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+def _wkb_positions(positions: List) -> bytes:
+    return struct.pack("<I", len(positions)) + b"".join(struct.pack("<dd", p[0], p[1]) for p in positions)
+
+def _wkb_rings(rings: List) -> bytes:
+    return struct.pack("<I", len(rings)) + b"".join(_wkb_positions(ring) for ring in rings)
+
+def to_wkb(geometry) -> bytes:
+    "Encode a GeoJSON geometry as little-endian 2D WKB."
+    geom_type = geometry["type"]
+    coordinates = geometry["coordinates"]
+    header = struct.pack("<BI", 1, WKB_TYPES[geom_type])
+    if(geom_type == "Point"):
+        return header + struct.pack("<dd", coordinates[0], coordinates[1])
+    elif(geom_type == "LineString"):
+        return header + _wkb_positions(coordinates)
+    elif(geom_type == "Polygon"):
+        return header + _wkb_rings(coordinates)
+    elif(geom_type == "MultiPoint"):
+        return header + struct.pack("<I", len(coordinates)) + b"".join(
+            to_wkb({"type": "Point", "coordinates": p}) for p in coordinates)
+    elif(geom_type == "MultiLineString"):
+        return header + struct.pack("<I", len(coordinates)) + b"".join(
+            to_wkb({"type": "LineString", "coordinates": line}) for line in coordinates)
+    else:
+        return header + struct.pack("<I", len(coordinates)) + b"".join(
+            to_wkb({"type": "Polygon", "coordinates": polygon}) for polygon in coordinates)
+
+def layer_filename(basename: str, layer_name: str, fmt: str) -> str:
+    "Build the output filename of a single layer, e.g. out-roads.fgb."
+    extension = FORMAT_EXTENSIONS[fmt]
+    if(basename.endswith(extension)):
+        basename = basename[:-len(extension)]
+    return basename + "-" + layer_name + extension
+
+def open_layer_writer(filename: str, fmt: str, layer_name: str = None, json_indent: int = 0):
+    "Create a writer for one layer. Features are added with add_features() and flushed by close()."
+    if(fmt == "fgb"):
+        from .FlatGeobufWriter import FlatGeobufWriter
+        return FlatGeobufWriter(filename, layer_name)
+    elif(fmt == "parquet"):
+        from .GeoParquetWriter import GeoParquetWriter
+        return GeoParquetWriter(filename)
+    else:
+        from .GeoJSONWriter import GeoJSONWriter
+        return GeoJSONWriter(filename, json_indent)
+
+def write_layer(filename: str, fmt: str, layer_name: str, layer_content, json_indent: int = 0) -> None:
+    "Write a single decoded layer (a FeatureCollection) to a file."
+    with open_layer_writer(filename, fmt, layer_name, json_indent) as writer:
+        writer.add_features(layer_content["features"])
@@ -0,0 +1,8 @@
+from .fetch import main_for
+from .providers import XYZ
+
+def main():
+    main_for(XYZ, "Fetch multiple tiles from any {z}/{x}/{y} vector tile server and convert to GeoJSON.")
+
+if __name__ == '__main__':
+    main()
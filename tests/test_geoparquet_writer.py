@@ -0,0 +1,35 @@
+import json
+import pytest
+
+pyarrow = pytest.importorskip("pyarrow")
+import pyarrow.parquet
+from geojson import Feature, Point
+from vtdecode.writer.GeoParquetWriter import GeoParquetWriter
+
+def point_feature(x: float, y: float, properties: dict) -> Feature:
+    return Feature(geometry=Point(coordinates=(x, y)), properties=properties)
+
+def test_geometry_property_is_kept(tmp_path):
+    filename = str(tmp_path / "layer.parquet")
+    with GeoParquetWriter(filename) as writer:
+        writer.add_features([
+            point_feature(1.0, 2.0, {"geometry": "point", "name": "a"}),
+            point_feature(3.0, 4.0, {"name": "b"}),
+        ])
+
+    table = pyarrow.parquet.read_table(filename)
+    assert table.column_names == ["_geometry", "name", "geometry"]
+    assert table.column("_geometry").to_pylist() == ["point", None]
+    assert table.column("name").to_pylist() == ["a", "b"]
+    assert table.schema.field("geometry").type == pyarrow.binary()
+    assert json.loads(table.schema.metadata[b"geo"])["primary_column"] == "geometry"
+
+def test_renamed_column_does_not_collide(tmp_path):
+    filename = str(tmp_path / "layer.parquet")
+    with GeoParquetWriter(filename) as writer:
+        writer.add_features([point_feature(1.0, 2.0, {"geometry": "point", "_geometry": "other"})])
+
+    table = pyarrow.parquet.read_table(filename)
+    assert table.column_names == ["__geometry", "_geometry", "geometry"]
+    assert table.column("__geometry").to_pylist() == ["point"]
+    assert table.column("_geometry").to_pylist() == ["other"]
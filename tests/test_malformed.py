@@ -0,0 +1,118 @@
+import pytest
+from vtdecode.decoder import vector_tile_pb2 as vt_proto
+from vtdecode.decoder.BytesDecoder import BytesDecoder
+from vtdecode.decoder.MalformedTileError import MalformedTileError
+from vtdecode.decoder.utils import geometry_parts, tag_pairs, GEOM_POINT, GEOM_LINESTRING, GEOM_POLYGON
+
+def zigzag(value: int) -> int:
+    return (value << 1) ^ (value >> 31)
+
+def command(command_id: int, *coordinates: int) -> list:
+    "One command with its count, followed by its zigzag encoded parameters."
+    count = max(len(coordinates) // 2, 1)
+    return [command_id | (count << 3)] + [zigzag(value) for value in coordinates]
+
+def tile_with(features: list) -> bytes:
+    "Tile with one layer of (type, geometry, tags) features."
+    tile = vt_proto.Tile()
+    layer = tile.layers.add()
+    layer.name = "test"
+    layer.version = 2
+    layer.extent = 4096
+    layer.keys.append("name")
+    layer.values.add().string_value = "a"
+    for geom_type, geometry, tags in features:
+        feature = layer.features.add()
+        feature.type = geom_type
+        feature.geometry.extend(geometry)
+        feature.tags.extend(tags)
+    return tile.SerializeToString()
+
+SQUARE = command(1, 10, 10) + command(2, 100, 0, 0, 100, -100, 0) + command(7)
+
+def collect():
+    problems = []
+    return problems, lambda problem, message: problems.append(problem)
+
+def test_geometry_parts_of_valid_features():
+    assert geometry_parts(command(1, 5, 6, 1, 1), GEOM_POINT) == [[(5, 6)], [(6, 7)]]
+    assert geometry_parts(command(1, 1, 1) + command(2, 10, 0), GEOM_LINESTRING) == [[(1, 1), (11, 1)]]
+    assert geometry_parts(SQUARE, GEOM_POLYGON) == [[(10, 10), (110, 10), (110, 110), (10, 110)]]
+
+@pytest.mark.parametrize("geom_type, geometry, problem", [
+    (GEOM_LINESTRING, command(2, 10, 0) + command(1, 1, 1) + command(2, 10, 0), "missing_moveto"),
+    (GEOM_LINESTRING, command(1, 1, 1) + command(2, 10, 0) + [5], "unknown_command"),
+    (GEOM_POINT, command(1, 1, 1) + command(2, 10, 0), "unexpected_command"),
+    (GEOM_POLYGON, SQUARE[:-1], "unclosed_ring"),
+    (GEOM_POLYGON, command(1, 10, 10) + command(2, 0, 100, 100, 0, 0, -100) + command(7) + SQUARE, "interior_before_exterior"),
+])
+def test_geometry_parts_reports_and_repairs(geom_type, geometry, problem):
+    problems, report = collect()
+    assert geometry_parts(geometry, geom_type, report) is not None
+    assert problems == [problem]
+
+@pytest.mark.parametrize("geom_type, geometry, problem", [
+    (7, SQUARE, "unknown_geometry_type"),
+    (GEOM_POLYGON, SQUARE[:2], "truncated_geometry"),
+    (GEOM_POINT, [], "empty_geometry"),
+])
+def test_geometry_parts_skips(geom_type, geometry, problem):
+    problems, report = collect()
+    assert geometry_parts(geometry, geom_type, report) is None
+    assert problems == [problem]
+
+def test_tag_pairs():
+    problems, report = collect()
+    assert tag_pairs([0, 0, 1, 0, 0], 1, 1, report) == [(0, 0)]
+    assert problems == ["odd_tags", "invalid_tag"]
+
+MALFORMED = [
+    (GEOM_LINESTRING, command(2, 10, 0) + command(1, 1, 1) + command(2, 10, 0), [0, 0]),
+    (GEOM_POLYGON, SQUARE, [0, 3]),
+    (0, SQUARE, [0, 0]),
+    (GEOM_POINT, command(1, 20, 20), [0, 0]),
+]
+
+def test_decode_paths_agree_leniently():
+    body = tile_with(MALFORMED)
+    decoder = BytesDecoder(0, 0, 1, body)
+    decoded = decoder.decode()
+    aggregator = BytesDecoder(0, 0, 1, body)
+    aggregate = aggregator.aggregate().summary()
+    overzoom = BytesDecoder(0, 0, 1, body)
+    overzoom.overzoom(1, 0, 0, buffer=4096)
+
+    assert len(decoded["test"]["features"]) == aggregate["test"]["features"] == 3
+    assert decoder.problems == aggregator.problems == overzoom.problems
+    assert decoder.problems == {"missing_moveto": 1, "invalid_tag": 1, "unknown_geometry_type": 1}
+
+@pytest.mark.parametrize("run", [
+    lambda decoder: decoder.decode(),
+    lambda decoder: decoder.aggregate(),
+    lambda decoder: decoder.overzoom(2, 0, 0),
+])
+def test_decode_paths_agree_strictly(run):
+    with pytest.raises(MalformedTileError) as error:
+        run(BytesDecoder(0, 0, 1, tile_with(MALFORMED), strict=True))
+    assert error.value.problem == "missing_moveto"
+
+def test_overzoom_keeps_decoded_geometry():
+    # A child covering the whole parent, so nothing is clipped away.
+    body = tile_with(MALFORMED)
+    assert BytesDecoder(0, 0, 1, body).overzoom(1, 0, 0) == BytesDecoder(0, 0, 1, body).decode()
+
+@pytest.mark.parametrize("geom_type, geometry", [
+    (GEOM_LINESTRING, command(1, 1, 1)),
+    (GEOM_LINESTRING, command(1, 1, 1) + [5]),
+    (GEOM_LINESTRING, command(1, 1, 1) + command(2, 0, 0)),
+    (GEOM_POLYGON, command(1, 1, 1) + command(2, 10, 0, -10, 0) + command(7)),
+])
+def test_degenerate_geometry_is_dropped(geom_type, geometry):
+    problems, report = collect()
+    assert geometry_parts(geometry, geom_type, report) is None
+    assert "degenerate_geometry" in problems and problems[-1] == "empty_geometry"
+
+def test_degenerate_part_is_dropped_from_multi_geometry():
+    problems, report = collect()
+    assert geometry_parts(command(1, 1, 1) + command(1, 5, 5) + command(2, 10, 0), GEOM_LINESTRING, report) == [[(6, 6), (16, 6)]]
+    assert problems == ["degenerate_geometry"]
@@ -0,0 +1,28 @@
+import os
+from vtdecode.manifest import Manifest, file_snapshot
+
+def test_file_replaced_while_decoding_is_not_current(tmp_path):
+    tile = tmp_path / "0.pbf"
+    tile.write_bytes(b"old tile")
+    output = tmp_path / "0.json"
+    output.write_text("{}")
+
+    with Manifest(str(tmp_path / "manifest.sqlite")) as manifest:
+        snapshot = file_snapshot(str(tile))
+        # Replaced after the snapshot was taken, while the old content is being decoded.
+        replacement = tmp_path / "0.pbf.new"
+        replacement.write_bytes(b"new tile content")
+        os.replace(str(replacement), str(tile))
+        manifest.record(str(tile), "options", [str(output)], snapshot)
+        assert not manifest.is_current(str(tile), "options")
+
+def test_unchanged_file_is_current(tmp_path):
+    tile = tmp_path / "0.pbf"
+    tile.write_bytes(b"tile")
+    output = tmp_path / "0.json"
+    output.write_text("{}")
+
+    with Manifest(str(tmp_path / "manifest.sqlite")) as manifest:
+        manifest.record(str(tile), "options", [str(output)], file_snapshot(str(tile)))
+        assert manifest.is_current(str(tile), "options")
+        assert not manifest.is_current(str(tile), "other options")
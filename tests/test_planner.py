@@ -0,0 +1,19 @@
+import pytest
+from vtdecode.planner import parse_bbox, plan_tiles
+
+def test_parse_bbox():
+    assert parse_bbox("10,49,11,50") == (10.0, 49.0, 11.0, 50.0)
+    # min_lon > max_lon crosses the antimeridian.
+    assert parse_bbox("179,-1,-179,1") == (179.0, -1.0, -179.0, 1.0)
+
+@pytest.mark.parametrize("text", ["10,49,11", "a,b,c,d", "10,50,11,49", "10,-91,11,50", "-181,49,11,50"])
+def test_parse_bbox_rejects_invalid(text):
+    with pytest.raises(ValueError):
+        parse_bbox(text)
+
+def test_plan_tiles_rejects_inverted_latitudes():
+    with pytest.raises(ValueError):
+        plan_tiles([3], bbox=(10, 50, 11, 49))
+
+def test_plan_tiles_splits_antimeridian():
+    assert sorted(plan_tiles([5], bbox=(179, -1, -179, 1))) == [(5, 0, 15), (5, 0, 16), (5, 31, 15), (5, 31, 16)]
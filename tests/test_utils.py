@@ -0,0 +1,8 @@
+import math
+from vtdecode.decoder.utils import MAX_LATITUDE, latlon_to_offset
+
+def test_latlon_to_offset_clamps_latitude():
+    assert latlon_to_offset(0, 0, 0, 0.0, 90.0, 4096) == latlon_to_offset(0, 0, 0, 0.0, MAX_LATITUDE, 4096)
+    assert latlon_to_offset(0, 0, 0, 0.0, -90.0, 4096) == latlon_to_offset(0, 0, 0, 0.0, -MAX_LATITUDE, 4096)
+    x, y = latlon_to_offset(0, 0, 0, 180.0, -90.0, 4096)
+    assert math.isclose(x, 4096) and math.isclose(y, 4096)